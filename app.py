@@ -1,12 +1,12 @@
 import streamlit as st
-import yfinance as yf
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import feedparser
-from datetime import datetime, timedelta
-import time
-from streamlit_autorefresh import st_autorefresh
+
+from assets import LOGO_WIDTHS, minify_css, prewarm_thumbnails, thumbnail
+from charts import (build_analysis_figure, build_correlation_heatmap, build_rolling_correlation_figure, can_patch,
+                    patch_anchor, patch_analysis_figure)
+from engine import (ACTIONS, CORRELATION_WINDOW, EQUAL_WEIGHT, LIVE_PERIOD, LIVE_REFRESH, METRICS_EXPORT_INTERVAL,
+                    MIN_VARIANCE, POLL_INTERVAL, TAPE_REFRESH, calculate_weighted_score, export_metrics,
+                    get_alert_engine, get_live_bars, get_market_poller, get_quote_tape, get_yahoo_gateway,
+                    has_scoring_history, latency_table, perf_trace, portfolio_risk, score_band, screen_universe, timed)
 
 # ==========================================
 # 1. CONFIGURATION
@@ -25,15 +25,45 @@ if 'page' not in st.session_state: st.session_state.page = 'home'
 def navigate_to(page): st.session_state.page = page; st.rerun()
 
 
+SNAPSHOT_CHECK_SECONDS = 5  # vérification de version, sans calcul ni appel réseau
+
+
+@st.fragment(run_every=SNAPSHOT_CHECK_SECONDS)
+def watch_snapshot(ticker, period, version):
+    """ Relance la page uniquement quand le poller a publié un nouvel instantané de la série """
+    if get_market_poller().version(ticker, period) != version:
+        st.rerun(scope="app")
+
+
+LOGOS = {"TotalEnergies": "logo_total.png", "Hermès": "logo_hermes.png",
+         "Dassault Systèmes": "logo_dassault.png", "Sopra Steria": "logo_sopra.png",
+         "Airbus": "logo_airbus.png"}
+prewarm_thumbnails(tuple(LOGOS.values()), LOGO_WIDTHS["header"])
+get_alert_engine().start()  # une seule boucle par processus, partagée par toutes les sessions
+get_quote_tape().start()  # premier instantané prêt avant le premier visiteur
+
+PERIOD_MAP = {
+    "1 Jour": "1d",
+    "5 Jours": "5d",
+    "1 Mois": "1mo",
+    "3 Mois": "3mo",
+    "6 Mois": "6mo",
+    "1 An": "1y",
+    "2 Ans": "2y",
+    "5 Ans": "5y",
+    "Max": "max"
+}
+
 # --- SIDEBAR GLOBALE & PARAMÈTRES ---
 with st.sidebar:
     try:
-        st.image("logo_esigelec.png", width=120)
+        st.image(thumbnail("logo_esigelec.png", LOGO_WIDTHS["sidebar"]), width=120)
     except:
         st.markdown("### ESIGELEC")
 
     # Toggle Dark Mode
     is_dark_mode = st.toggle("🌙 Mode Sombre", value=True)
+    show_perf = st.toggle("⏱️ Debug performance", value=False)
 
     st.divider()
 
@@ -42,41 +72,47 @@ with st.sidebar:
         st.markdown("### ⚡ PARAMÈTRES")
 
         # 1. Choix de l'Action
-        ACTIONS = {"TotalEnergies": "TTE.PA", "Hermès": "RMS.PA", "Dassault Systèmes": "DSY.PA",
-                   "Sopra Steria": "SOP.PA", "Airbus": "AIR.PA", "LVMH": "MC.PA", "Schneider Electric": "SU.PA"}
-
-        LOGOS = {"TotalEnergies": "logo_total.png", "Hermès": "logo_hermes.png",
-                 "Dassault Systèmes": "logo_dassault.png", "Sopra Steria": "logo_sopra.png",
-                 "Airbus": "logo_airbus.png"}
-
         choix = st.selectbox("Actif", list(ACTIONS.keys()))
 
         # 2. Choix de la Période
         st.markdown("<br>", unsafe_allow_html=True)
-        PERIOD_MAP = {
-            "1 Jour": "1d",
-            "5 Jours": "5d",
-            "1 Mois": "1mo",
-            "3 Mois": "3mo",
-            "6 Mois": "6mo",
-            "1 An": "1y",
-            "2 Ans": "2y",
-            "5 Ans": "5y",
-            "Max": "max"
-        }
         choix_periode = st.selectbox("Période d'analyse", list(PERIOD_MAP.keys()), index=6)  # Default 2y
         selected_period = PERIOD_MAP[choix_periode]
 
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("⬅ ACCUEIL"): navigate_to('home')
-        st.caption("⏱️ SYNC : 60s")
-        st_autorefresh(interval=60 * 1000, key="marketupdater")
+        if st.button("📊 SCREENER"): navigate_to('screener')
+        if st.button("🧮 RISQUE"): navigate_to('risk')
+        live_mode = selected_period == LIVE_PERIOD and st.toggle(f"🔴 LIVE ({LIVE_REFRESH}s)", value=False)
+        st.caption(f"⏱️ SYNC : {LIVE_REFRESH if live_mode else POLL_INTERVAL}s (flux partagé)")
+    elif st.session_state.page == 'screener':
+        st.markdown("### 📊 SCREENER")
+        choix = None
+        live_mode = False
+        choix_periode = st.selectbox("Période d'analyse", list(PERIOD_MAP.keys()), index=5)  # Default 1y
+        selected_period = PERIOD_MAP[choix_periode]
+
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("⬅ ACCUEIL"): navigate_to('home')
+        if st.button("⚡ TERMINAL"): navigate_to('analysis')
+        if st.button("🧮 RISQUE"): navigate_to('risk')
+    elif st.session_state.page == 'risk':
+        st.markdown("### 🧮 RISQUE")
+        choix = None
+        live_mode = False
+        # Périodes journalières uniquement, assez longues pour la corrélation glissante
+        choix_periode = st.selectbox("Période d'analyse", list(PERIOD_MAP.keys())[3:], index=2)  # Default 1y
+        selected_period = PERIOD_MAP[choix_periode]
+
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("⬅ ACCUEIL"): navigate_to('home')
+        if st.button("⚡ TERMINAL"): navigate_to('analysis')
+        if st.button("📊 SCREENER"): navigate_to('screener')
     else:
-        # Variables vides pour la home pour éviter les erreurs
-        ACTIONS = {"TotalEnergies": "TTE.PA"}
-        LOGOS = {}
+        # Variables par défaut pour la home pour éviter les erreurs
         choix = "TotalEnergies"
         selected_period = "1y"
+        live_mode = False
 
 # ==========================================
 # 2. GESTION DES THÈMES (CSS)
@@ -138,281 +174,41 @@ light_css = """
 </style>
 """
 
-st.markdown(common_css, unsafe_allow_html=True)
-if is_dark_mode:
-    st.markdown(dark_css, unsafe_allow_html=True)
-    graph_template = "plotly_dark"
-    graph_bg = "rgba(0,0,0,0)"
-    graph_grid = "rgba(255,255,255,0.1)"
-else:
-    st.markdown(light_css, unsafe_allow_html=True)
-    graph_template = "plotly_white"
-    graph_bg = "rgba(255,255,255,0.5)"
-    graph_grid = "rgba(0,0,0,0.1)"
+# Un seul bloc minifié par thème, construit une fois par processus
+st.markdown(minify_css(common_css, dark_css if is_dark_mode else light_css), unsafe_allow_html=True)
 
 
 # ==========================================
-# 3. LOGIQUE MÉTIER & CALCULS
+# 3. INTERFACES
 # ==========================================
-def get_data_and_consensus(ticker, period="2y"):
-    """ Récupère les données avec période et intervalle intelligents """
-    stock = yf.Ticker(ticker)
-
-    if period == "1d":
-        interval = "2m"
-    elif period == "5d":
-        interval = "15m"
-    else:
-        interval = "1d"
-
-    df = stock.history(period=period, interval=interval)
 
-    if not df.empty:
-        last_price = df['Close'].iloc[-1]
-    else:
-        last_price = 0
-
-    try:
-        info = stock.info
-        rec_key = info.get('recommendationKey', 'none')
-        target_price = info.get('targetMeanPrice', 0)
-        consensus_score = 2.5
-
-        if rec_key == 'strong_buy':
-            consensus_score = 5
-        elif rec_key == 'buy':
-            consensus_score = 4
-        elif rec_key == 'outperform':
-            consensus_score = 4
-        elif rec_key == 'hold':
-            consensus_score = 2.5
-        elif rec_key == 'underperform':
-            consensus_score = 1
-        elif rec_key == 'sell':
-            consensus_score = 0
-
-        per = info.get('trailingPE') or info.get('forwardPE', 0)
-        div_rate = info.get('dividendRate')
-        if div_rate is None: div_rate = info.get('trailingAnnualDividendRate', 0)
-
-        if div_rate and last_price > 0:
-            div_yield = div_rate / last_price
-        else:
-            div_yield = info.get('dividendYield', 0)
-            if div_yield is None: div_yield = 0
-            if div_yield > 1: div_yield = div_yield / 100
-
-        fonda = {"per": per, "yield": div_yield, "div_amt": div_rate,
-                 "consensus_txt": rec_key.replace('_', ' ').upper(), "consensus_score": consensus_score,
-                 "target_price": target_price}
-    except:
-        fonda = {"per": 0, "yield": 0, "div_amt": 0, "consensus_txt": "N/A", "consensus_score": 2.5, "target_price": 0}
-    return df, fonda
-
-
-def get_fresh_news(company_name):
-    query = company_name.replace(" ", "+")
-    rss_url = f"https://news.google.com/rss/search?q={query}+bourse+finance&hl=fr&gl=FR&ceid=FR:fr"
-    feed = feedparser.parse(rss_url)
-    news_list = []
-    positive_words = ['hausse', 'bondit', 'record', 'achat', 'surperforme', 'contrat', 'succès', 'approbation',
-                      'dividende', 'solide', 'profit']
-    negative_words = ['chute', 'baisse', 'perte', 'alerte', 'dette', 'procès', 'échec', 'sanction', 'démission',
-                      'faible', 'incertitude']
-    time_threshold = datetime.now() - timedelta(hours=48)
-    raw_sentiment = 0;
-    count = 0
-
-    for entry in feed.entries:
-        try:
-            pub_date = datetime.fromtimestamp(time.mktime(entry.published_parsed))
-        except:
+def ticker_tape_html():
+    """ Bandeau construit depuis le dernier instantané partagé (aucun appel réseau au rendu) """
+    tape = get_quote_tape()
+    quotes, fetched_at = tape.snapshot()
+    items = [f'<div class="ticker__item">🕒 <span>{fetched_at:%H:%M}</span></div>' if fetched_at
+             else '<div class="ticker__item">🕒 <span>chargement…</span></div>']
+    for label, (symbol, unit) in tape.watchlist.items():
+        if symbol not in quotes:
+            items.append(f'<div class="ticker__item">{label} <span>—</span></div>')
             continue
-        if pub_date < time_threshold: continue
-
-        title = entry.title;
-        link = entry.link;
-        color = "grey";
-        score_mod = 0
-        title_lower = title.lower()
-
-        if any(w in title_lower for w in positive_words):
-            color = "green";
-            score_mod = 1
-        elif any(w in title_lower for w in negative_words):
-            color = "red";
-            score_mod = -1
-
-        raw_sentiment += score_mod;
-        count += 1
-        news_list.append({"title": title, "date": pub_date.strftime('%d/%m %H:%M'), "link": link, "color": color})
-        if count >= 6: break
-
-    if raw_sentiment > 0:
-        final_news_score = 4 + (min(raw_sentiment, 2) * 0.5)
-    elif raw_sentiment < 0:
-        final_news_score = 1
-    else:
-        final_news_score = 2.5
-    return news_list, final_news_score
-
-
-def calculate_indicators(df):
-    if len(df) < 50:
-        # Sécurité si pas assez de données
-        for col in ['RSI', 'Upper', 'Lower', 'SMA_200', 'SMA_50', 'MACD', 'Signal_Line']:
-            df[col] = 0
-        df['Upper'] = df['Close'];
-        df['Lower'] = df['Close']
-        return df
-
-    # 1. RSI
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-
-    # 2. Bollinger Bands
-    df['SMA_20'] = df['Close'].rolling(20).mean()
-    df['STD_20'] = df['Close'].rolling(20).std()
-    df['Upper'] = df['SMA_20'] + (2 * df['STD_20'])
-    df['Lower'] = df['SMA_20'] - (2 * df['STD_20'])
-
-    # 3. SMA 200 (Tendance Long terme)
-    df['SMA_200'] = df['Close'].rolling(200).mean()
-
-    # --- NOUVEAUX INDICATEURS ---
-
-    # 4. SMA 50 (Tendance Moyen terme)
-    df['SMA_50'] = df['Close'].rolling(50).mean()
-
-    # 5. MACD (Moving Average Convergence Divergence)
-    # EMA 12 et 26
-    ema12 = df['Close'].ewm(span=12, adjust=False).mean()
-    ema26 = df['Close'].ewm(span=26, adjust=False).mean()
-    df['MACD'] = ema12 - ema26
-    # Ligne de Signal (EMA 9 du MACD)
-    df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
-
-    return df
-
-
-def calculate_weighted_score(df, fonda, news_score):
-    if len(df) < 50: return 2.5, ["Données insuffisantes pour l'analyse technique complète"]
-
-    last = df.iloc[-1]
-    prev = df.iloc[-2]  # Pour voir les croisements récents
-    reasons = []
-    tech_points = 0
-
-    # --- RSI (Max 1 pt) ---
-    if pd.notna(last['RSI']):
-        if last['RSI'] < 35:
-            tech_points += 1;
-            reasons.append("Tech: RSI en Survente (Rebond probable)")
-        elif last['RSI'] > 70:
-            tech_points -= 1;
-            reasons.append("Tech: RSI en Surachat (Correction probable)")
-        else:
-            tech_points += 0.5;
-            reasons.append(f"Tech: RSI Neutre ({int(last['RSI'])})")
-
-    # --- Bollinger (Max 1.5 pts) ---
-    if pd.notna(last['Lower']):
-        if last['Close'] < last['Lower']:
-            tech_points += 1.5;
-            reasons.append("Tech: Prix sous Bollinger Basse (Signal Achat fort)")
-        elif last['Close'] > last['Upper']:
-            tech_points -= 1;
-            reasons.append("Tech: Prix sur Bollinger Haute (Signal Vente)")
-        else:
-            tech_points += 0.5;
-            reasons.append("Tech: Volatilité normale (Bandes Bollinger)")
-
-    # --- SMA 50 & 200 (Max 1.5 pts) ---
-    if pd.notna(last['SMA_50']):
-        if last['Close'] > last['SMA_50']:
-            tech_points += 0.5;
-            reasons.append("Tech: Prix > Moyenne Mobile 50j (Hausse moyen terme)")
-        else:
-            reasons.append("Tech: Prix < Moyenne Mobile 50j (Pression baissière)")
-
-    if pd.notna(last['SMA_200']):
-        if last['Close'] > last['SMA_200']:
-            tech_points += 0.5;
-            reasons.append("Tech: Prix > SMA 200 (Tendance fond Haussière)")
-
-        # Golden Cross check
-        if last['SMA_50'] > last['SMA_200'] and prev['SMA_50'] <= prev['SMA_200']:
-            tech_points += 1;
-            reasons.append("Tech: 🌟 GOLDEN CROSS DÉTECTÉE (SMA 50 croise SMA 200)")
-        elif last['SMA_50'] > last['SMA_200']:
-            tech_points += 0.25;
-            reasons.append("Tech: Configuration Golden Cross active")
-
-    # --- MACD (Max 1 pt) ---
-    if pd.notna(last['MACD']):
-        if last['MACD'] > last['Signal_Line']:
-            tech_points += 1;
-            reasons.append("Tech: MACD au-dessus du Signal (Momentum Acheteur)")
-        else:
-            tech_points -= 1;
-            reasons.append("Tech: MACD sous le Signal (Momentum Vendeur)")
-
-    # Normalisation du score technique sur 5
-    # Total potentiel max ~ 5.5 points. On divise par 5.5 et remet sur 5
-    tech_score_5 = (max(0, tech_points) / 5.5) * 5
-
-    # Analyse Fondamentale
-    fund_points = 0
-    if fonda['per'] > 0 and fonda['per'] < 15:
-        fund_points += 1;
-        reasons.append(f"Fonda: Action sous-évaluée (PER {fonda['per']:.1f})")
-    elif fonda['per'] > 35:
-        fund_points -= 1;
-        reasons.append(f"Fonda: Valorisation élevée (PER {fonda['per']:.1f})")
-    else:
-        reasons.append(f"Fonda: PER Standard ({fonda['per']:.1f})")
-
-    if fonda['yield'] > 0.035:
-        fund_points += 1;
-        reasons.append(f"Fonda: Dividende attractif ({fonda['yield'] * 100:.1f}%)")
+        price, change = quotes[symbol]
+        css, arrow = ("up", "▲") if change >= 0 else ("down", "▼")
+        value = f"{price:,.0f}" if price >= 1000 else f"{price:,.2f}"
+        items.append(f'<div class="ticker__item">{label} <span class="{css}">{arrow} {value} {unit}'
+                     f' ({change:+.2f}%)</span></div>')
+    return f'<div class="ticker-wrap"><div class="ticker">{"".join(items)}</div></div>'
 
-    fund_score_5 = (max(0, fund_points) / 2) * 5
-    reasons.append(f"Consensus: Analystes '{fonda['consensus_txt']}'")
 
-    # Calcul Final
-    # Tech 40%, Consensus 20%, Fonda 20%, News 20%
-    final_score = (
-                (tech_score_5 * 0.40) + (fonda['consensus_score'] * 0.20) + (fund_score_5 * 0.20) + (news_score * 0.20))
+@st.fragment(run_every=TAPE_REFRESH)
+def ticker_tape():
+    """ Seul le bandeau est relancé à chaque instantané, pas la page d'accueil """
+    st.markdown(ticker_tape_html(), unsafe_allow_html=True)
 
-    return round(final_score, 2), reasons
-
-
-# ==========================================
-# 4. INTERFACES
-# ==========================================
 
 def show_home_page():
     # TICKER TAPE
-    st.markdown("""
-    <div class="ticker-wrap">
-        <div class="ticker">
-            <div class="ticker__item">BTC/USD <span class="up">▲ 98,450 $</span></div>
-            <div class="ticker__item">ETH/USD <span class="up">▲ 3,890 $</span></div>
-            <div class="ticker__item">TOTALENERGIES <span class="up">▲ 62.8 €</span></div>
-            <div class="ticker__item">LVMH <span class="down">▼ 615.4 €</span></div>
-            <div class="ticker__item">AIRBUS <span class="up">▲ 142.5 €</span></div>
-            <div class="ticker__item">HERMÈS <span class="up">▲ 2,050 €</span></div>
-            <div class="ticker__item">SANOFI <span class="down">▼ 88.2 €</span></div>
-            <div class="ticker__item">CAC 40 <span class="up">▲ 7,650</span></div>
-            <div class="ticker__item">S&P 500 <span class="up">▲ 5,900</span></div>
-            <div class="ticker__item">NASDAQ <span class="up">▲ 19,500</span></div>
-            <div class="ticker__item">GOLD <span class="up">▲ 2,610 $</span></div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    ticker_tape()
 
     st.markdown("<br><br><br><br><br>", unsafe_allow_html=True)
 
@@ -420,7 +216,7 @@ def show_home_page():
     c_logo, c_hero, c_btn = st.columns([1, 3, 1], gap="medium")
     with c_logo:
         try:
-            st.image("logo_esigelec.png", use_container_width=True)
+            st.image(thumbnail("logo_esigelec.png", LOGO_WIDTHS["header"]), use_container_width=True)
         except:
             pass
 
@@ -480,7 +276,7 @@ def show_analysis_page():
     with c_logo:
         logo_file = LOGOS.get(choix, "logo_esigelec.png")
         try:
-            st.image(logo_file, use_container_width=True)
+            st.image(thumbnail(logo_file, LOGO_WIDTHS["header"]), use_container_width=True)
         except:
             st.write("")
 
@@ -497,17 +293,53 @@ def show_analysis_page():
     st.markdown("<br>", unsafe_allow_html=True)
 
     with st.spinner('Calcul des indicateurs MACD & SMA50 en cours...'):
-        df, fonda = get_data_and_consensus(ACTIONS[choix], period=selected_period)
-        df = calculate_indicators(df)
-        news, news_score_5 = get_fresh_news(choix)
-        global_score, args = calculate_weighted_score(df, fonda, news_score_5)
-        current_price = df['Close'].iloc[-1]
+        with timed("snapshot", ticker=ACTIONS[choix], period=selected_period):
+            snapshot = get_market_poller().get(ACTIONS[choix], selected_period)
+    if snapshot is None:
+        st.error("Données de marché indisponibles pour le moment, nouvel essai au prochain rafraîchissement.")
+        watch_snapshot(ACTIONS[choix], selected_period, 0)
+        return
+    if not live_mode:
+        watch_snapshot(ACTIONS[choix], selected_period, snapshot.version)
+
+    # Instantané partagé entre sessions : lecture seule
+    df, fonda, news, fetch_errors = snapshot.df, snapshot.fonda, snapshot.news, snapshot.errors
+    global_score, args = snapshot.score, snapshot.reasons
+
+    if fetch_errors:
+        st.caption("⚠️ Sources partielles : " + ", ".join(fetch_errors))
+
+    if live_mode:
+        live_panel(ACTIONS[choix], selected_period)
+        st.markdown("### 📰 FLUX D'ACTUALITÉS")
+        render_news(news)
+        return
+
+    render_market_panel(df, fonda, global_score, args, snapshot.timeframe_scores, snapshot.mtf_score)
+
+    # GRAPHIQUES (ADAPTATIF DARK/LIGHT)
+    tab1, tab2 = st.tabs(["📈 CHARTING COMPLET (MACD/RSI)", "📰 FLUX D'ACTUALITÉS"])
+    with tab1:
+        with timed("figure", bars=len(df)):
+            fig = build_analysis_figure(df, is_dark_mode)
+        with timed("chart_send"):
+            st.plotly_chart(fig, use_container_width=True)
+
+    with tab2:
+        render_news(news)
+
+
+def render_market_panel(df, fonda, global_score, args, timeframe_scores=None, mtf_score=None):
+    """ KPI, jauge de score, lecture multi-horizons et matrice décisionnelle """
+    current_price = df['Close'].iloc[-1]
 
     # KPI
     kpi1, kpi3, kpi4 = st.columns(3)
     kpi1.metric("PRIX ACTUEL", f"{current_price:.2f} €", f"🎯 {fonda['target_price']} €")
     kpi3.metric("DIVIDENDE", f"{fonda['div_amt']} €")
     kpi4.metric("RENDEMENT", f"{fonda['yield'] * 100:.2f}%")
+    if fonda['as_of'] is not None:
+        st.caption(f"Fondamentaux Yahoo au {fonda['as_of']:%d/%m/%Y %H:%M}")
 
     st.markdown("<br>", unsafe_allow_html=True)
 
@@ -518,16 +350,11 @@ def show_analysis_page():
         st.markdown("### 🎯 SIGNAL IA GLOBAL")
         st.progress(global_score / 5)
         st.metric("SCORE DE CONFIANCE", f"{global_score} / 5.0")
-        if global_score >= 3.8:
-            st.success("🚀 ACHAT FORT (STRONG BUY)")
-        elif global_score >= 3.0:
-            st.info("↗️ ACCUMULER (BUY)")
-        elif global_score <= 1.5:
-            st.error("⛔ VENTE FORTE (STRONG SELL)")
-        elif global_score <= 2.2:
-            st.warning("↘️ ALLÉGER (SELL)")
-        else:
-            st.warning("⏸️ NEUTRE (HOLD)")
+        label, kind = score_band(global_score)
+        getattr(st, kind)(label)
+        if mtf_score is not None:
+            detail = " · ".join(f"{tf} {score:.1f}" for tf, score in timeframe_scores.items())
+            st.caption(f"Technique multi-horizons : {mtf_score} / 5 ({detail})")
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col_details:
@@ -545,79 +372,165 @@ def show_analysis_page():
 
     st.markdown("<br>", unsafe_allow_html=True)
 
-    # GRAPHIQUES (ADAPTATIF DARK/LIGHT)
-    tab1, tab2 = st.tabs(["📈 CHARTING COMPLET (MACD/RSI)", "📰 FLUX D'ACTUALITÉS"])
+
+def render_news(news):
+    if len(news) == 0:
+        st.info("Aucun signal détecté sur les dernières 48h.")
+        return
+    for n in news:
+        title_col = "white" if is_dark_mode else "#2c3e50"
+        st.markdown(f"""
+        <div class="glass-container" style="padding: 15px; margin-bottom: 10px; display: flex; justify-content: space-between; align-items: center;">
+            <div><a href="{n['link']}" target="_blank" style="text-decoration: none; color: {title_col}; font-weight: bold; font-size: 1.1em;">{n['title']}</a><br><span style="color: #888; font-size: 0.8em;">📅 {n['date']}</span></div>
+            <div style="font-weight: bold; color: {'#00ff88' if n['color'] == 'green' else '#ff3131' if n['color'] == 'red' else '#888'};">{'POSITIF ▲' if n['color'] == 'green' else 'NÉGATIF ▼' if n['color'] == 'red' else 'NEUTRE ■'}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+@st.fragment(run_every=LIVE_REFRESH)
+def live_panel(ticker, period):
+    """ Mode live intraday : seuls KPI, jauge et dernières bougies sont relancés, le graphique est patché """
+    with timed("live_tick", ticker=ticker):
+        snapshot = get_market_poller().get(ticker, period)  # fondamentaux et news, suivis par le poller
+        df = get_live_bars(ticker)
+        if df.empty:
+            df = snapshot.df
+        global_score, args = calculate_weighted_score(df, snapshot.fonda, snapshot.news_score)
+        render_market_panel(df, snapshot.fonda, global_score, args)
+
+        state = st.session_state.get("live_chart")
+        chart_key = (ticker, is_dark_mode, df.index[0], has_scoring_history(df))
+        if (state is None or state["key"] != chart_key or len(df) < state["bars"]
+                or not can_patch(state["anchor"], df, state["bars"])):
+            with timed("figure", bars=len(df)):
+                fig = build_analysis_figure(df, is_dark_mode)
+        else:
+            with timed("figure_patch", bars=len(df) - state["bars"] + 1):
+                fig = patch_analysis_figure(state["fig"], df.iloc[state["bars"] - 1:])
+        st.session_state.live_chart = {"key": chart_key, "fig": fig, "bars": len(df), "anchor": patch_anchor(df)}
+        with timed("chart_send"):
+            st.plotly_chart(fig, use_container_width=True, key="live_chart_view")
+
+
+def show_screener_page():
+    title_color = "white" if is_dark_mode else "#2c3e50"
+    st.markdown(f"""
+    <h1 style='font-size: 3em; margin: 0; color: {title_color};'>
+        SCREENER : <span style='color:#FF4B4B'>{len(ACTIONS)} ACTIFS</span>
+    </h1>
+    """, unsafe_allow_html=True)
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    with st.spinner('Scan de l\'univers en cours...'):
+        ranking = screen_universe(ACTIONS, selected_period)
+
+    if ranking.empty:
+        st.error("Données de marché indisponibles pour le moment.")
+        return
+
+    st.caption("Score technique sur 5 (RSI, Bollinger, SMA 50/200, MACD) — cliquez sur une colonne pour trier.")
+    st.dataframe(
+        ranking, hide_index=True, use_container_width=True,
+        column_config={
+            "Cours": st.column_config.NumberColumn(format="%.2f €"),
+            "Var. %": st.column_config.NumberColumn(format="%+.2f %%"),
+            "RSI": st.column_config.NumberColumn(format="%.0f"),
+            "Score": st.column_config.ProgressColumn(min_value=0, max_value=5, format="%.2f"),
+            "Raisons": st.column_config.TextColumn(width="large"),
+        })
+
+    st.markdown("### 🔔 ALERTES RÉCENTES")
+    alerts = get_alert_engine().recent(50)
+    if not alerts:
+        st.caption("Aucune alerte depuis le démarrage du serveur.")
+        return
+    st.dataframe(
+        [{"Heure": a["fired_at"], "Actif": a["ticker"], "Alerte": a["label"], "Bougie": a["bar"],
+          "Cours": a["close"]} for a in alerts],
+        hide_index=True, use_container_width=True,
+        column_config={
+            "Heure": st.column_config.DatetimeColumn(format="DD/MM HH:mm:ss"),
+            "Bougie": st.column_config.DateColumn(format="DD/MM/YYYY"),
+            "Cours": st.column_config.NumberColumn(format="%.2f €"),
+        })
+
+
+def show_risk_page():
+    title_color = "white" if is_dark_mode else "#2c3e50"
+    st.markdown(f"""
+    <h1 style='font-size: 3em; margin: 0; color: {title_color};'>
+        RISQUE : <span style='color:#FF4B4B'>PORTEFEUILLE {len(ACTIONS)} ACTIFS</span>
+    </h1>
+    """, unsafe_allow_html=True)
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    with st.spinner('Calcul des corrélations en cours...'):
+        report = portfolio_risk(ACTIONS, selected_period)
+
+    if report is None:
+        st.error("Historiques insuffisants pour estimer les corrélations.")
+        return
+
+    kpi1, kpi2, kpi3 = st.columns(3)
+    kpi1.metric("VOLATILITÉ ÉQUIPONDÉRÉ", f"{report.portfolio_vol[EQUAL_WEIGHT] * 100:.1f} %")
+    kpi2.metric("VOLATILITÉ VARIANCE MIN.", f"{report.portfolio_vol[MIN_VARIANCE] * 100:.1f} %")
+    kpi3.metric("CORRÉLATION MOYENNE", f"{report.avg_corr:.2f}")
+    st.caption(f"Volatilités annualisées, rendements journaliers sur {len(report.returns)} séances.")
+
+    tab1, tab2, tab3 = st.tabs(["🔥 CORRÉLATIONS", f"📉 CORRÉLATION GLISSANTE {CORRELATION_WINDOW}J",
+                                "⚖️ ALLOCATIONS"])
     with tab1:
-        # Création de 3 sous-graphiques : Prix, RSI, MACD
-        fig = make_subplots(rows=3, cols=1, shared_xaxes=True,
-                            row_heights=[0.6, 0.2, 0.2],
-                            vertical_spacing=0.05)
-
-        candle_up = '#00ff88' if is_dark_mode else '#007bff'
-        candle_down = '#ff3131' if is_dark_mode else '#dc3545'
-
-        # ROW 1 : PRIX + BOLLINGER + SMA 50/200
-        fig.add_trace(
-            go.Candlestick(x=df.index, open=df['Open'], close=df['Close'], high=df['High'], low=df['Low'], name="Prix",
-                           increasing_line_color=candle_up, decreasing_line_color=candle_down), row=1, col=1)
-        fig.add_trace(
-            go.Scatter(x=df.index, y=df['Upper'], line=dict(color='rgba(128,128,128,0.3)', width=1), showlegend=False),
-            row=1, col=1)
-        fig.add_trace(
-            go.Scatter(x=df.index, y=df['Lower'], line=dict(color='rgba(128,128,128,0.3)', width=1), fill='tonexty',
-                       fillcolor='rgba(128,128,128,0.05)', name="Bollinger"), row=1, col=1)
-
-        # SMA 200 (Cyan)
-        if 'SMA_200' in df.columns and not df['SMA_200'].isnull().all():
-            fig.add_trace(go.Scatter(x=df.index, y=df['SMA_200'], line=dict(color='#00f2ff', width=2), name="SMA 200"),
-                          row=1, col=1)
-        # SMA 50 (Jaune)
-        if 'SMA_50' in df.columns and not df['SMA_50'].isnull().all():
-            fig.add_trace(go.Scatter(x=df.index, y=df['SMA_50'], line=dict(color='#FFD700', width=1.5, dash='dash'),
-                                     name="SMA 50"), row=1, col=1)
-
-        # ROW 2 : RSI
-        fig.add_trace(go.Scatter(x=df.index, y=df['RSI'], line=dict(color='#bc13fe', width=2), name="RSI"), row=2,
-                      col=1)
-        fig.add_hline(y=30, line_color="#00ff88", line_dash="dot", row=2, col=1)
-        fig.add_hline(y=70, line_color="#ff3131", line_dash="dot", row=2, col=1)
-
-        # ROW 3 : MACD
-        # Histogramme
-        colors_macd = ['#00ff88' if val >= 0 else '#ff3131' for val in (df['MACD'] - df['Signal_Line'])]
-        fig.add_trace(
-            go.Bar(x=df.index, y=(df['MACD'] - df['Signal_Line']), marker_color=colors_macd, name="MACD Hist"), row=3,
-            col=1)
-        # Lignes MACD
-        fig.add_trace(go.Scatter(x=df.index, y=df['MACD'], line=dict(color='#2962FF', width=1.5), name="MACD"), row=3,
-                      col=1)
-        fig.add_trace(go.Scatter(x=df.index, y=df['Signal_Line'], line=dict(color='#FF6D00', width=1.5), name="Signal"),
-                      row=3, col=1)
-
-        fig.update_layout(height=800, xaxis_rangeslider_visible=False,
-                          paper_bgcolor=graph_bg, plot_bgcolor=graph_bg,
-                          font=dict(color="#aaa" if is_dark_mode else "#333"),
-                          hovermode="x unified", legend=dict(bgcolor='rgba(0,0,0,0)'), template=graph_template)
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor=graph_grid)
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor=graph_grid)
-
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(build_correlation_heatmap(report.corr, is_dark_mode), use_container_width=True)
 
     with tab2:
-        if len(news) == 0:
-            st.info("Aucun signal détecté sur les dernières 48h.")
-        else:
-            for n in news:
-                title_col = "white" if is_dark_mode else "#2c3e50"
-                st.markdown(f"""
-                <div class="glass-container" style="padding: 15px; margin-bottom: 10px; display: flex; justify-content: space-between; align-items: center;">
-                    <div><a href="{n['link']}" target="_blank" style="text-decoration: none; color: {title_col}; font-weight: bold; font-size: 1.1em;">{n['title']}</a><br><span style="color: #888; font-size: 0.8em;">📅 {n['date']}</span></div>
-                    <div style="font-weight: bold; color: {'#00ff88' if n['color'] == 'green' else '#ff3131' if n['color'] == 'red' else '#888'};">{'POSITIF ▲' if n['color'] == 'green' else 'NÉGATIF ▼' if n['color'] == 'red' else 'NEUTRE ■'}</div>
-                </div>
-                """, unsafe_allow_html=True)
+        names = list(report.rolling_corr.columns)
+        selected = st.multiselect("Actifs", names, default=names[:8])
+        st.caption("Corrélation de chaque actif avec le portefeuille équipondéré.")
+        if selected:
+            st.plotly_chart(build_rolling_correlation_figure(report.rolling_corr[selected], is_dark_mode),
+                            use_container_width=True)
+
+    with tab3:
+        allocation = report.weights.assign(**{"Volatilité": report.volatility})
+        st.dataframe(
+            allocation, use_container_width=True,
+            column_config={
+                EQUAL_WEIGHT: st.column_config.ProgressColumn(min_value=0, max_value=1, format="percent"),
+                MIN_VARIANCE: st.column_config.ProgressColumn(min_value=0, max_value=1, format="percent"),
+                "Volatilité": st.column_config.NumberColumn(format="percent"),
+            })
+        st.caption("Variance minimale sans vente à découvert, sur la covariance de la période.")
+
+
+def show_perf_panel(trace):
+    """ Panneau de debug : décomposition du rerun en cours et percentiles glissants par étape """
+    with st.sidebar.expander("⏱️ PERFORMANCE", expanded=True):
+        if not trace:
+            st.caption("Aucune étape mesurée sur ce rerun.")
+            return
+        st.metric("TOTAL RERUN", f"{trace.get('page', sum(trace.values())) * 1e3:.0f} ms")
+        st.dataframe(latency_table(trace), hide_index=True, use_container_width=True,
+                     column_config={c: st.column_config.NumberColumn(format="%.1f")
+                                    for c in ("Rerun (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)")})
+        yahoo = get_yahoo_gateway().stats()
+        st.caption(f"Yahoo : {yahoo['calls']} requêtes · {yahoo['coalesced']} mutualisées · "
+                   f"{yahoo['throttled']} différées · {yahoo['rate_limited']} limitées (429)")
 
 
 if st.session_state.page == 'home':
     show_home_page()
 else:
-    show_analysis_page()
+    with perf_trace() as trace:
+        with timed("page", page=st.session_state.page):
+            if st.session_state.page == 'screener':
+                show_screener_page()
+            elif st.session_state.page == 'risk':
+                show_risk_page()
+            else:
+                show_analysis_page()
+    if show_perf:
+        show_perf_panel(trace)
+    try:
+        export_metrics(min_interval=METRICS_EXPORT_INTERVAL)
+    except OSError:
+        pass  # répertoire en lecture seule : les métriques restent visibles dans le panneau
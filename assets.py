@@ -0,0 +1,76 @@
+""" Ressources statiques : vignettes des logos à la taille d'affichage et CSS des thèmes.
+
+Construites une fois par processus et gardées en mémoire, indexées par l'empreinte du contenu :
+chaque rerun ne renvoie qu'une petite image identique (même URL média, déjà en cache chez le client).
+"""
+import functools
+import hashlib
+import io
+import os
+import re
+import threading
+
+from PIL import Image
+
+# Largeur des vignettes (px). st.image redimensionne à chaque appel toute image plus large que `width`
+# et réencode tout ce qui n'est pas du PNG/JPEG : vignettes PNG, jamais plus larges que l'affichage.
+LOGO_WIDTHS = {"sidebar": 120, "header": 520}
+THUMBNAIL_FORMAT = "PNG"
+
+_thumbnails = {}  # (empreinte, largeur, format) -> octets encodés
+_thumbnails_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=64)
+def _read_source(path, mtime_ns, size):
+    """ Contenu et empreinte d'un fichier ; (mtime, taille) invalident l'entrée si le fichier change """
+    with open(path, "rb") as f:
+        data = f.read()
+    return hashlib.sha256(data).hexdigest(), data
+
+
+def thumbnail(path, width, fmt=THUMBNAIL_FORMAT):
+    """ Logo redimensionné à `width` px de large (jamais agrandi), encodé une seule fois par contenu """
+    stat = os.stat(path)
+    digest, data = _read_source(path, stat.st_mtime_ns, stat.st_size)
+    key = (digest, width, fmt)
+    with _thumbnails_lock:
+        if key in _thumbnails:
+            return _thumbnails[key]
+
+    with Image.open(io.BytesIO(data)) as image:
+        # reducing_gap : réduction entière rapide avant le filtre Lanczos (logos de plusieurs milliers de px)
+        image.thumbnail((width, image.height), Image.LANCZOS, reducing_gap=3.0)
+        out = io.BytesIO()
+        image.save(out, format=fmt, optimize=True)
+    encoded = out.getvalue()
+    if len(encoded) >= len(data):
+        encoded = data  # source déjà plus légère que la vignette
+
+    with _thumbnails_lock:
+        return _thumbnails.setdefault(key, encoded)
+
+
+@functools.lru_cache(maxsize=8)
+def minify_css(*blocks):
+    """ Un seul bloc <style> à partir de plusieurs, commentaires et espaces superflus retirés """
+    css = "\n".join(re.sub(r"</?style>", "", block) for block in blocks)
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return f"<style>{css.strip()}</style>"
+
+
+@functools.cache
+def prewarm_thumbnails(paths, width):
+    """ Construit les vignettes en arrière-plan, une fois par processus (paths : tuple de fichiers) """
+    def build():
+        for path in paths:
+            try:
+                thumbnail(path, width)
+            except OSError:
+                pass  # logo absent : l'affichage retombe sur son repli habituel
+
+    thread = threading.Thread(target=build, name="thumbnails", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,85 @@
+""" Benchmark : calculate_indicators (référence pandas) vs noyau NumPy.
+
+Usage : python benchmarks/bench_indicators.py
+Mesure le temps médian et le pic mémoire (tracemalloc) sur des séries synthétiques, après
+contrôle de parité du noyau et du moteur incrémental (ajouts, révisions de la dernière bougie).
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine import (INDICATOR_COLUMNS, calculate_indicators, calculate_indicators_pandas,  # noqa: E402
+                    indicator_kernel)
+
+SIZES = {"1 An (250)": 250, "5 Ans (1260)": 1260, "Max intraday (100k)": 100_000}
+REPEAT = 7
+
+
+def synthetic_close(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+def measure(fn, *args):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return float(np.median(timings)), peak
+
+
+def check_parity(close):
+    ref = calculate_indicators_pandas(pd.DataFrame({"Close": close}))
+    for col, values in zip(INDICATOR_COLUMNS, indicator_kernel(close)):
+        if not np.allclose(ref[col].to_numpy(dtype=float), values, rtol=1e-9, atol=1e-6, equal_nan=True):
+            raise AssertionError(f"Écart pandas/NumPy sur {col}")
+
+
+def check_engine_parity(close, start=300, seed=1):
+    """ Moteur incrémental (clé de série) : ajouts d'une ou plusieurs bougies et révisions de la dernière """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2000-01-03", periods=len(close), freq="B")
+    key = ("PARITY", len(close))
+    n, revised = start, close.copy()
+    previous = None
+    while n <= len(close):
+        if rng.random() < 0.4:
+            revised[n - 1] *= 1 + rng.normal(0, 0.01)  # dernière bougie révisée (séance en cours)
+        df = pd.DataFrame({"Close": revised[:n]}, index=index[:n])
+        frozen = previous.copy() if previous is not None else None
+        out = calculate_indicators(df.copy(), key=key)
+        if frozen is not None and not frozen.equals(previous):
+            raise AssertionError(f"Colonnes déjà remises modifiées par le moteur ({n} bougies)")
+        ref = calculate_indicators_pandas(df.copy())
+        for col in INDICATOR_COLUMNS:
+            if not np.allclose(ref[col].to_numpy(dtype=float), out[col].to_numpy(dtype=float),
+                               rtol=1e-9, atol=1e-6, equal_nan=True):
+                raise AssertionError(f"Écart moteur incrémental/pandas sur {col} ({n} bougies)")
+        previous = out
+        n += int(rng.integers(0, 3))  # 0 : rerun sur la même série, éventuellement révisée
+
+
+def main():
+    check_engine_parity(synthetic_close(3000))
+    print(f"{'Série':<22}{'pandas (ms)':>12}{'numpy (ms)':>12}{'speedup':>9}{'pic pandas':>12}{'pic numpy':>12}")
+    for label, n in SIZES.items():
+        close = synthetic_close(n)
+        check_parity(close)
+        t_pd, m_pd = measure(lambda: calculate_indicators_pandas(pd.DataFrame({"Close": close})))
+        t_np, m_np = measure(indicator_kernel, close)
+        print(f"{label:<22}{t_pd * 1e3:>12.2f}{t_np * 1e3:>12.2f}{t_pd / t_np:>8.1f}x"
+              f"{m_pd / 1024:>10.0f}KB{m_np / 1024:>10.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+""" Benchmark mémoire : octets par série "max" en cache, selon la représentation.
+
+Usage : python benchmarks/bench_memory.py [--tickers 500]
+Compare le format yfinance (float64, dividendes, splits) à la version compacte du cache,
+puis projette l'empreinte d'un univers complet (cours + indicateurs d'une période affichée).
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import engine  # noqa: E402
+from benchmarks.fakes import synthetic_ohlcv  # noqa: E402
+
+MAX_BARS = 6000  # ~24 ans de séances
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Empreinte mémoire des séries en cache")
+    parser.add_argument("--tickers", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    raw = synthetic_ohlcv(MAX_BARS)
+    variants = {"yfinance (float64)": raw, "compact float64": engine.compact_ohlcv(raw, float32=False),
+                "compact float32": engine.compact_ohlcv(raw, float32=True)}
+    indicators = engine.calculate_indicators(engine.compact_ohlcv(raw))
+    indicator_bytes = sum(indicators[col].to_numpy().nbytes for col in engine.INDICATOR_COLUMNS)
+
+    print(f"{'Représentation':<22}{'octets/série':>14}{'octets/bougie':>15}{f'univers {args.tickers}':>16}")
+    for label, df in variants.items():
+        size = engine.frame_nbytes(df)
+        print(f"{label:<22}{size:>14,}{size / MAX_BARS:>15.1f}{size * args.tickers / 2 ** 20:>13.1f} Mo")
+    print(f"{'+ indicateurs (7 col.)':<22}{indicator_bytes:>14,}{indicator_bytes / MAX_BARS:>15.1f}"
+          f"{indicator_bytes * args.tickers / 2 ** 20:>13.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+""" Données hors ligne pour les benchmarks : OHLCV synthétiques, faux yf.Ticker et flux RSS enregistrés.
+
+offline() remplace yfinance et feedparser.parse le temps d'un bloc `with`, redirige le stockage
+SQLite vers un dossier temporaire et vide les caches du moteur, pour des mesures reproductibles.
+"""
+import contextlib
+import contextvars
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from email.utils import format_datetime, parsedate_to_datetime
+
+import feedparser
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FEED_FIXTURES = {"Airbus": "google_news_airbus.xml", "LVMH": "google_news_lvmh.xml"}
+DEFAULT_FEED = "google_news_airbus.xml"
+
+# Nombre de bougies servies par "period" (séances ou barres intraday)
+PERIOD_BARS = {"1d": 255, "5d": 170, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260,
+               "max": 6000}
+INTERVAL_FREQ = {"2m": "2min", "15m": "15min", "1d": "B"}
+
+_REAL_PARSE = feedparser.parse
+
+CANNED_INFO = {"recommendationKey": "buy", "targetMeanPrice": 175.0, "trailingPE": 24.3, "forwardPE": 21.8,
+               "dividendRate": 2.8, "dividendYield": 1.6}
+
+
+def synthetic_ohlcv(n, freq="B", seed=0, end="2026-10-16 17:30", start_price=100.0):
+    """ Marche aléatoire log-normale au format yfinance (index Europe/Paris) """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.012, n)))
+    spread = np.abs(rng.normal(0, 0.006, n)) * close
+    open_ = np.r_[start_price, close[:-1]]
+    index = pd.date_range(end=pd.Timestamp(end), periods=n, freq=freq, tz="Europe/Paris")
+    index.name = "Date" if freq == "B" else "Datetime"
+    if freq == "B":
+        index = index.normalize()
+    return pd.DataFrame({"Open": open_, "High": np.maximum(open_, close) + spread,
+                         "Low": np.minimum(open_, close) - spread, "Close": close,
+                         "Volume": rng.integers(1e5, 5e6, n), "Dividends": 0.0, "Stock Splits": 0.0},
+                        index=index)
+
+
+# Appelant des requêtes simulées (session du test de charge) ; None : threads d'arrière-plan.
+# Copié dans les threads du pool de collecte avec le reste du contexte.
+upstream_owner = contextvars.ContextVar("upstream_owner", default=None)
+
+
+class UpstreamStats:
+    """ Compteurs d'appels simulés (history, info, download, rss), au total et par appelant """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.by_owner = {}
+
+    def hit(self, name):
+        owner = upstream_owner.get()
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            calls = self.by_owner.setdefault(owner, {})
+            calls[name] = calls.get(name, 0) + 1
+
+    def total(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+
+class FakeTicker:
+    """ Remplaçant de yf.Ticker : history()/info déterministes par ticker, latence configurable """
+
+    latency = 0.0
+    stats = UpstreamStats()
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+        self._seed = zlib.crc32(ticker.encode())
+
+    def history(self, period=None, interval="1d", start=None, **kwargs):
+        self.stats.hit("history")
+        time.sleep(self.latency)
+        n = PERIOD_BARS["max"] if interval == "1d" else 60 * 255
+        df = synthetic_ohlcv(n, INTERVAL_FREQ[interval], seed=self._seed)
+        if start is not None:
+            return df[df.index >= pd.Timestamp(start)]
+        if period in ("1d", "5d"):
+            sessions = df.index.normalize().unique()
+            return df[df.index.normalize() >= sessions[-(1 if period == "1d" else 5)]]
+        return df.iloc[-PERIOD_BARS.get(period, n):]
+
+    @property
+    def info(self):
+        self.stats.hit("info")
+        time.sleep(self.latency)
+        return dict(CANNED_INFO)
+
+
+def fake_download(tickers, period="1y", interval="1d", **kwargs):
+    """ Remplaçant de yf.download (colonnes MultiIndex ticker / champ) """
+    FakeTicker.stats.hit("download")
+    time.sleep(FakeTicker.latency)
+    tickers = [tickers] if isinstance(tickers, str) else tickers
+    frames = {t: FakeTicker(t).history(period=period, interval=interval) for t in tickers}
+    return pd.concat(frames, axis=1)
+
+
+def load_feed(filename, now=None):
+    """ Flux enregistré, dates recalées pour que les articles restent dans la fenêtre de 48h """
+    with open(os.path.join(FIXTURES_DIR, filename), encoding="utf-8") as f:
+        xml = f.read()
+    built = parsedate_to_datetime(re.search(r"<lastBuildDate>([^<]+)", xml).group(1))
+    shift = (now or pd.Timestamp.now(tz="UTC").to_pydatetime()) - built
+
+    def recaler(match):
+        return f"<pubDate>{format_datetime(parsedate_to_datetime(match.group(1)) + shift)}"
+
+    return re.sub(r"<pubDate>([^<]+)", recaler, xml)
+
+
+def fake_parse(url, etag=None, modified=None, **kwargs):
+    """ Remplaçant de feedparser.parse : sert la fixture correspondant à la requête """
+    FakeTicker.stats.hit("rss")
+    time.sleep(FakeTicker.latency)
+    filename = next((f for name, f in FEED_FIXTURES.items() if name.replace(" ", "+") in url), DEFAULT_FEED)
+    return _REAL_PARSE(load_feed(filename))
+
+
+def reset_engine_caches():
+    import engine
+    for worker in (engine.get_quote_tape, engine.get_market_poller, engine.get_alert_engine):
+        if worker.cache_info().currsize:
+            worker().stop()
+    for getter in (engine.get_price_cache, engine.get_ohlcv_store, engine.get_feed_cache,
+                   engine.get_sentiment_matcher, engine.get_indicator_engines, engine.get_quote_tape,
+                   engine.get_market_poller, engine.get_fundamentals_store, engine.get_revalidations,
+                   engine.get_timeframe_cache, engine.get_yahoo_gateway, engine.get_alert_engine,
+                   engine.get_alert_log, engine.get_empty_batch_series):
+        getter.cache_clear()
+
+
+@contextlib.contextmanager
+def offline(latency=0.0):
+    """ yfinance / feedparser simulés, stockage SQLite temporaire, caches du moteur vidés """
+    import engine
+
+    saved = (yf.Ticker, yf.download, feedparser.parse, engine.OHLCV_DB_PATH)
+    FakeTicker.latency = latency
+    FakeTicker.stats = UpstreamStats()
+    with tempfile.TemporaryDirectory() as tmp:
+        yf.Ticker, yf.download, feedparser.parse = FakeTicker, fake_download, fake_parse
+        engine.OHLCV_DB_PATH = os.path.join(tmp, "market_data.sqlite")
+        reset_engine_caches()
+        try:
+            yield FakeTicker.stats
+        finally:
+            yf.Ticker, yf.download, feedparser.parse, engine.OHLCV_DB_PATH = saved
+            reset_engine_caches()
@@ -0,0 +1,244 @@
+""" Test de charge hors ligne : N sessions Streamlit (AppTest) gardant la page d'analyse ouverte.
+
+Chaque session choisit un couple (actif, période), puis relance le script complet toutes les
+`--interval` secondes, comme un onglet rafraîchi automatiquement. yfinance et le flux RSS sont
+remplacés par les faux de benchmarks/fakes.py, avec une latence réglable.
+
+Usage :
+    python benchmarks/loadtest.py --sessions 50 --duration 120 --interval 10 --latency 0.3
+    python benchmarks/loadtest.py --sessions 200 --ramp 0 -o loadtest.json   # tous les onglets au même instant
+
+Rapport : percentiles de latence des reruns (exécution et file d'attente), CPU, mémoire résidente
+et appels amont simulés, par session (reruns des sessions) et en arrière-plan (poller, bandeau,
+revalidations).
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import engine  # noqa: E402
+from benchmarks.fakes import offline, upstream_owner  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "app.py")
+SESSION_KEY = "loadtest_session"  # clé de session_state portant l'identifiant de la session simulée
+DEFAULT_PERIODS = "1 Mois,1 An,2 Ans,5 Ans"  # libellés du sélecteur de période de app.py
+QUANTILES = (50, 95, 99)
+# AppTest installe son propre Runtime global le temps d'un run : les reruns des sessions passent un par un.
+# L'attente de ce verrou mesure la file d'attente d'un serveur saturé (le GIL sérialise déjà le Python).
+_apptest_lock = threading.Lock()
+
+
+def rss_bytes():
+    """ Mémoire résidente actuelle (Linux : /proc), sinon pic depuis le démarrage """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ResourceMonitor:
+    """ Échantillonne la mémoire résidente en tâche de fond ; CPU du processus entre start et stop """
+
+    def __init__(self, every=0.5):
+        self.every = every
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loadtest-monitor", daemon=True)
+
+    def start(self):
+        self.cpu_start, self.wall_start = time.process_time(), time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.cpu = time.process_time() - self.cpu_start
+        self.wall = time.perf_counter() - self.wall_start
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append(rss_bytes())
+            self._stop.wait(self.every)
+
+
+@contextlib.contextmanager
+def owned_perf_trace():
+    """ Remplace engine.perf_trace : les appels amont d'un rerun sont aussi marqués avec sa session """
+    import streamlit as st
+
+    perf_trace = engine.perf_trace
+
+    @contextlib.contextmanager
+    def trace():
+        token = upstream_owner.set(st.session_state.get(SESSION_KEY))
+        try:
+            with perf_trace() as recorded:
+                yield recorded
+        finally:
+            upstream_owner.reset(token)
+
+    engine.perf_trace = trace
+    try:
+        yield
+    finally:
+        engine.perf_trace = perf_trace
+
+
+def timed_run(at):
+    """ Un rerun : (attente du tour, durée du rerun) en secondes """
+    queued = time.perf_counter()
+    with _apptest_lock:
+        start = time.perf_counter()
+        at.run()
+    return start - queued, time.perf_counter() - start
+
+
+def run_session(name, choix, periode, args, start_at, deadline):
+    """ Ouvre la page d'analyse puis la relance jusqu'à deadline ; renvoie attentes, durées (s) et erreurs """
+    from streamlit.testing.v1 import AppTest
+
+    time.sleep(max(0.0, start_at - time.monotonic()))
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    at.session_state["page"] = "analysis"
+    at.session_state[SESSION_KEY] = name
+    runs, errors = [], 0
+    next_run = time.monotonic()
+    while True:
+        try:
+            runs.append(timed_run(at))
+            errors += len(at.exception)
+        except Exception:
+            errors += 1  # délai du script dépassé
+        if len(runs) == 1 and not errors:
+            # Premier rendu (sélection par défaut) : on choisit ensuite l'actif et la période de la session
+            at.sidebar.selectbox[0].set_value(choix)
+            at.sidebar.selectbox[1].set_value(periode)
+        next_run += args.interval
+        if next_run >= deadline:
+            break
+        time.sleep(max(0.0, next_run - time.monotonic()))
+    return {"session": name, "choix": choix, "periode": periode, "waits": [w for w, _ in runs],
+            "latencies": [w + d for w, d in runs], "durations": [d for _, d in runs], "errors": errors}
+
+
+def percentiles_ms(values):
+    if not values:
+        return {f"p{q}": None for q in QUANTILES} | {"max": None}
+    values = np.asarray(values) * 1e3
+    return {f"p{q}": float(np.percentile(values, q)) for q in QUANTILES} | {"max": float(values.max())}
+
+
+def summarize(sessions, stats, monitor, args):
+    first = [s["latencies"][0] for s in sessions if s["latencies"]]
+    reruns = [x for s in sessions for x in s["latencies"][1:]]
+    durations = [x for s in sessions for x in s["durations"][1:]]
+    waits = [x for s in sessions for x in s["waits"][1:]]
+    per_session = []
+    for s in sessions:
+        calls = stats.by_owner.get(s["session"], {})
+        per_session.append({"session": s["session"], "choix": s["choix"], "periode": s["periode"],
+                            "reruns": len(s["latencies"]), "errors": s["errors"],
+                            "latency_ms": percentiles_ms(s["latencies"]), "upstream": calls,
+                            "upstream_total": sum(calls.values())})
+    session_calls = [row["upstream_total"] for row in per_session]
+    return {
+        "config": {"sessions": args.sessions, "duration": args.duration, "interval": args.interval,
+                   "latency": args.latency, "ramp": args.ramp, "poll_interval": args.poll_interval},
+        "reruns": sum(len(s["latencies"]) for s in sessions),
+        "errors": sum(s["errors"] for s in sessions),
+        "first_render_ms": percentiles_ms(first),
+        "rerun_ms": percentiles_ms(reruns),
+        "rerun_service_ms": percentiles_ms(durations),
+        "rerun_wait_ms": percentiles_ms(waits),
+        "cpu_s": monitor.cpu,
+        "cpu_share": monitor.cpu / monitor.wall if monitor.wall else 0.0,
+        "rss_bytes": monitor.samples[-1] if monitor.samples else rss_bytes(),
+        "rss_peak_bytes": max(monitor.samples, default=rss_bytes()),
+        "upstream": dict(stats.calls),
+        "upstream_background": stats.by_owner.get(None, {}),
+        "upstream_per_session": {"mean": float(np.mean(session_calls)) if session_calls else 0.0,
+                                 "max": max(session_calls, default=0)},
+        "sessions": per_session,
+    }
+
+
+def print_report(report):
+    def row(label, q):
+        cells = "".join(f"{q[k]:>10.1f}" if q[k] is not None else f"{'-':>10}" for k in ("p50", "p95", "p99", "max"))
+        print(f"{label:<24}{cells}")
+
+    config = report["config"]
+    print(f"Sessions : {config['sessions']}  |  reruns : {report['reruns']}  |  erreurs : {report['errors']}")
+    print(f"{'Latence (ms)':<24}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    row("premier rendu", report["first_render_ms"])
+    row("rafraîchissements", report["rerun_ms"])
+    row("  dont exécution", report["rerun_service_ms"])
+    row("  dont file d'attente", report["rerun_wait_ms"])
+    print(f"CPU : {report['cpu_s']:.1f} s ({report['cpu_share']:.0%} d'un cœur)  |  "
+          f"RSS : {report['rss_bytes'] / 2 ** 20:.0f} Mo (pic {report['rss_peak_bytes'] / 2 ** 20:.0f} Mo)")
+    print(f"Appels amont : {report['upstream']}")
+    print(f"  arrière-plan : {report['upstream_background']}")
+    per_session = report["upstream_per_session"]
+    print(f"  par session : {per_session['mean']:.2f} en moyenne, {per_session['max']} au plus")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge hors ligne ESIG'Trade (sessions AppTest)")
+    parser.add_argument("--sessions", type=int, default=50, help="nombre de sessions simulées")
+    parser.add_argument("--duration", type=float, default=120, help="durée du test (s)")
+    parser.add_argument("--interval", type=float, default=engine.POLL_INTERVAL,
+                        help="secondes entre deux reruns d'une session (défaut : rafraîchissement de l'app)")
+    parser.add_argument("--ramp", type=float, help="arrivée des sessions étalée sur ce délai (défaut : --interval)")
+    parser.add_argument("--latency", type=float, default=0.2, help="latence simulée de Yahoo et du RSS (s)")
+    parser.add_argument("--poll-interval", type=float, default=engine.POLL_INTERVAL,
+                        help="secondes entre deux tours du poller")
+    parser.add_argument("--actions", default=",".join(engine.ACTIONS), help="actifs, séparés par des virgules")
+    parser.add_argument("--periods", default=DEFAULT_PERIODS, help="libellés de période, séparés par des virgules")
+    parser.add_argument("--timeout", type=float, default=60, help="délai maximum d'un rerun (s)")
+    parser.add_argument("-o", "--output", help="rapport JSON détaillé (par session)")
+    args = parser.parse_args(argv)
+    args.ramp = args.interval if args.ramp is None else args.ramp
+
+    selections = itertools.cycle(itertools.product(args.actions.split(","), args.periods.split(",")))
+    os.chdir(ROOT)  # logos et fichiers de l'app en chemins relatifs
+    with offline(args.latency) as stats, owned_perf_trace():
+        engine.get_market_poller().interval = args.poll_interval
+        monitor = ResourceMonitor()
+        monitor.start()
+        origin = time.monotonic()
+        deadline = origin + args.ramp + args.duration
+        results = [None] * args.sessions
+
+        def worker(i, choix, periode):
+            results[i] = run_session(f"s{i:03d}", choix, periode, args,
+                                     origin + args.ramp * i / args.sessions, deadline)
+
+        threads = [threading.Thread(target=worker, args=(i, *next(selections)), name=f"session-{i}")
+                   for i in range(args.sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        monitor.stop()
+        report = summarize([r for r in results if r is not None], stats, monitor, args)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Rapport : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
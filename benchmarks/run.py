@@ -0,0 +1,189 @@
+""" Suite de benchmarks hors ligne (aucun appel réseau).
+
+Usage :
+    python benchmarks/run.py                          # écrit benchmarks/results/<horodatage>.json
+    python benchmarks/run.py -o base.json
+    python benchmarks/run.py --compare base.json      # signale les cas plus lents que le seuil
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import engine  # noqa: E402
+from benchmarks.fakes import offline, synthetic_ohlcv  # noqa: E402
+from charts import build_analysis_figure  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SIZES = {"250": 250, "1260": 1260, "20k": 20_000}
+REGRESSION_THRESHOLD = 0.20  # +20% sur la médiane
+
+
+def timeit(fn, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        timings.append((time.perf_counter() - start) * 1e3)
+    timings.sort()
+    return {"median_ms": statistics.median(timings), "p95_ms": timings[int(0.95 * (len(timings) - 1))],
+            "min_ms": timings[0], "repeat": repeat}
+
+
+def bench_indicators(results, repeat):
+    for label, n in SIZES.items():
+        frame = synthetic_ohlcv(n)
+        results[f"indicators_pandas_{label}"] = timeit(
+            lambda df: engine.calculate_indicators_pandas(df), repeat, setup=frame.copy)
+        results[f"indicators_kernel_{label}"] = timeit(
+            lambda df: engine.calculate_indicators(df), repeat, setup=frame.copy)
+
+        # Moteur incrémental : dernière bougie révisée à chaque rafraîchissement
+        engine.calculate_indicators(frame.copy(), key=("BENCH", label))
+        close = frame.columns.get_loc("Close")
+
+        def revised():
+            df = frame.copy()
+            df.iloc[-1, close] *= 1 + np.random.normal(0, 0.001)
+            return df
+
+        results[f"indicators_engine_update_{label}"] = timeit(
+            lambda df: engine.calculate_indicators(df, key=("BENCH", label)), repeat, setup=revised)
+
+
+def bench_scoring(results, repeat):
+    fonda = engine.build_fondamentaux({"recommendationKey": "buy", "trailingPE": 12, "dividendRate": 3}, 100)
+    for label, n in SIZES.items():
+        df = engine.calculate_indicators(synthetic_ohlcv(n))
+        results[f"weighted_score_{label}"] = timeit(lambda: engine.calculate_weighted_score(df, fonda, 4), repeat)
+
+
+def bench_backtest(results, repeat):
+    # 20 ans de séances sur tout l'univers, indicateurs compris
+    frames = {t: synthetic_ohlcv(5040, seed=i) for i, t in enumerate(engine.ACTIONS.values())}
+    results["backtest_universe_20y"] = timeit(lambda: engine.backtest_universe(engine.ACTIONS, frames=frames), repeat)
+
+
+def bench_timeframes(results, repeat):
+    # Semaine + mois depuis une série journalière de 20 ans : rééchantillonnage et indicateurs
+    base = engine.compact_ohlcv(synthetic_ohlcv(5040))
+    results["timeframes_resample_20y"] = timeit(
+        lambda: [engine.calculate_indicators(engine.resample_ohlcv(base, rule)) for rule in engine.TIMEFRAMES.values()],
+        repeat)
+
+
+def bench_risk(results, repeat):
+    # Univers de 400 titres sur 5 ans : alignement, covariance, variance minimale, corrélation glissante
+    frames = {f"T{i:03d}": synthetic_ohlcv(1260, seed=i) for i in range(400)}
+    actions = {t: t for t in frames}
+    results["portfolio_risk_400x5y"] = timeit(lambda: engine.portfolio_risk(actions, "5y", frames=frames), repeat)
+
+
+def bench_alerts(results, repeat):
+    # Watchlist de 1000 titres sur 2 ans : passe avec une nouvelle bougie partout, puis passe sans changement.
+    # Comme un téléchargement "2y" réel, la fenêtre glisse : elle commence une séance plus tard.
+    series = {f"T{i:04d}": engine.compact_ohlcv(synthetic_ohlcv(506, seed=i)) for i in range(1000)}
+    previous = {t: df.iloc[:-1] for t, df in series.items()}
+    frames = {t: df.iloc[1:] for t, df in series.items()}
+    config = engine.load_alert_config(os.devnull) | {"tickers": list(frames)}
+
+    def warm():
+        alert_engine = engine.AlertEngine(config)
+        alert_engine.evaluate(previous)
+        return alert_engine
+
+    # Amorçage coûteux (indicateurs complets de chaque titre) : moins de répétitions
+    results["alerts_new_bar_1000"] = timeit(lambda e: e.evaluate(frames), max(3, repeat // 10), setup=warm)
+    alert_engine = warm()
+    alert_engine.evaluate(frames)
+    if alert_engine.reseeded != len(frames):  # seul l'amorçage initial réinitialise les moteurs
+        raise AssertionError(f"{alert_engine.reseeded - len(frames)} moteurs réamorcés sur une fenêtre glissante")
+    results["alerts_unchanged_1000"] = timeit(lambda: alert_engine.evaluate(frames), repeat)
+
+
+def bench_news(results, repeat):
+    # Froid : cache de flux et mémo vidés (parse XML + notation) ; chaud : flux en cache
+    def cold():
+        engine.get_feed_cache.cache_clear()
+        engine.get_sentiment_matcher.cache_clear()
+
+    results["news_cold"] = timeit(lambda _: engine.get_fresh_news("Airbus"), repeat, setup=cold)
+    results["news_warm"] = timeit(lambda: engine.get_fresh_news("Airbus"), repeat)
+
+
+def bench_fetch(results, repeat):
+    engine.fetch_analysis_data("AIR.PA", "Airbus", "2y")
+    results["fetch_analysis_warm"] = timeit(lambda: engine.fetch_analysis_data("AIR.PA", "Airbus", "2y"), repeat)
+
+
+def bench_figure(results, repeat):
+    for label, n in SIZES.items():
+        df = engine.calculate_indicators(synthetic_ohlcv(n))
+        results[f"figure_build_{label}"] = timeit(lambda: build_analysis_figure(df, True), repeat)
+        payload = build_analysis_figure(df, True).to_json()
+        results[f"figure_build_{label}"]["payload_bytes"] = len(payload)
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "machine": platform.machine()}
+
+
+def compare(current, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """ Affiche l'écart de médiane par cas ; renvoie le nombre de régressions """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = 0
+    for name, res in current.items():
+        if name not in baseline:
+            continue
+        ratio = res["median_ms"] / baseline[name]["median_ms"] - 1
+        flag = "  <-- RÉGRESSION" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"{name:<34}{baseline[name]['median_ms']:>10.3f}{res['median_ms']:>10.3f}{ratio:>+9.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne ESIG'Trade")
+    parser.add_argument("-o", "--output", help="fichier JSON de résultats")
+    parser.add_argument("--compare", help="résultats de référence (JSON) à comparer")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    results = {}
+    with offline():
+        for bench in (bench_indicators, bench_scoring, bench_backtest, bench_timeframes, bench_risk, bench_alerts,
+                      bench_news, bench_fetch, bench_figure):
+            bench(results, args.repeat)
+
+    for name, res in results.items():
+        print(f"{name:<34}{res['median_ms']:>10.3f} ms  (p95 {res['p95_ms']:.3f})")
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    print(f"Résultats : {output}")
+
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare) else 0)
+
+
+if __name__ == "__main__":
+    main()
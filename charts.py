@@ -0,0 +1,152 @@
+""" Construction des figures Plotly (sans Streamlit, réutilisable par les benchmarks). """
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from engine import downsample_for_chart
+
+# Trace nommée -> colonne de df (patch_analysis_figure)
+TRACE_COLUMNS = {"Bollinger Haute": "Upper", "Bollinger": "Lower", "SMA 200": "SMA_200", "SMA 50": "SMA_50",
+                 "RSI": "RSI", "MACD": "MACD", "Signal": "Signal_Line"}
+
+GRAPH_THEMES = {
+    True: {"template": "plotly_dark", "bg": "rgba(0,0,0,0)", "grid": "rgba(255,255,255,0.1)"},
+    False: {"template": "plotly_white", "bg": "rgba(255,255,255,0.5)", "grid": "rgba(0,0,0,0.1)"},
+}
+
+
+def build_analysis_figure(df, dark_mode=True):
+    """ Graphique 3 lignes : prix + Bollinger + SMA, RSI, MACD """
+    theme = GRAPH_THEMES[dark_mode]
+
+    # Création de 3 sous-graphiques : Prix, RSI, MACD
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True,
+                        row_heights=[0.6, 0.2, 0.2],
+                        vertical_spacing=0.05)
+
+    candle_up = '#00ff88' if dark_mode else '#007bff'
+    candle_down = '#ff3131' if dark_mode else '#dc3545'
+
+    # Données réduites côté serveur pour les longues périodes
+    chart = downsample_for_chart(df)
+    lines = chart["lines"]
+
+    # ROW 1 : PRIX + BOLLINGER + SMA 50/200
+    fig.add_trace(
+        go.Candlestick(x=chart["x"], open=chart["open"], close=chart["close"], high=chart["high"],
+                       low=chart["low"], name="Prix",
+                       increasing_line_color=candle_up, decreasing_line_color=candle_down), row=1, col=1)
+    fig.add_trace(
+        go.Scattergl(x=chart["x"], y=chart["upper"], line=dict(color='rgba(128,128,128,0.3)', width=1),
+                     name="Bollinger Haute", showlegend=False), row=1, col=1)
+    fig.add_trace(
+        go.Scattergl(x=chart["x"], y=chart["lower"], line=dict(color='rgba(128,128,128,0.3)', width=1),
+                     fill='tonexty', fillcolor='rgba(128,128,128,0.05)', name="Bollinger"), row=1, col=1)
+
+    # SMA 200 (Cyan)
+    if 'SMA_200' in df.columns and not df['SMA_200'].isnull().all():
+        fig.add_trace(go.Scattergl(x=lines['SMA_200'][0], y=lines['SMA_200'][1], line=dict(color='#00f2ff', width=2),
+                                   name="SMA 200"), row=1, col=1)
+    # SMA 50 (Jaune)
+    if 'SMA_50' in df.columns and not df['SMA_50'].isnull().all():
+        fig.add_trace(go.Scattergl(x=lines['SMA_50'][0], y=lines['SMA_50'][1],
+                                   line=dict(color='#FFD700', width=1.5, dash='dash'), name="SMA 50"), row=1, col=1)
+
+    # ROW 2 : RSI
+    fig.add_trace(go.Scattergl(x=lines['RSI'][0], y=lines['RSI'][1], line=dict(color='#bc13fe', width=2), name="RSI"),
+                  row=2, col=1)
+    fig.add_hline(y=30, line_color="#00ff88", line_dash="dot", row=2, col=1)
+    fig.add_hline(y=70, line_color="#ff3131", line_dash="dot", row=2, col=1)
+
+    # ROW 3 : MACD
+    # Histogramme (couleurs calculées en un seul np.where)
+    colors_macd = np.where(chart["hist"] >= 0, '#00ff88', '#ff3131')
+    fig.add_trace(go.Bar(x=chart["x"], y=chart["hist"], marker_color=colors_macd, name="MACD Hist"), row=3, col=1)
+    # Lignes MACD
+    fig.add_trace(go.Scattergl(x=lines['MACD'][0], y=lines['MACD'][1], line=dict(color='#2962FF', width=1.5),
+                               name="MACD"), row=3, col=1)
+    fig.add_trace(go.Scattergl(x=lines['Signal_Line'][0], y=lines['Signal_Line'][1],
+                               line=dict(color='#FF6D00', width=1.5), name="Signal"), row=3, col=1)
+
+    fig.update_layout(height=800, xaxis_rangeslider_visible=False,
+                      paper_bgcolor=theme["bg"], plot_bgcolor=theme["bg"],
+                      font=dict(color="#aaa" if dark_mode else "#333"),
+                      hovermode="x unified", legend=dict(bgcolor='rgba(0,0,0,0)'), template=theme["template"])
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor=theme["grid"])
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor=theme["grid"])
+
+    return fig
+
+
+def patch_analysis_figure(fig, tail):
+    """ Met à jour en place une figure de build_analysis_figure avec les bougies de tail.
+
+    Les points de chaque trace à partir de tail.index[0] sont remplacés (bougie en cours révisée),
+    les suivants ajoutés : pas de reconstruction des sous-graphiques ni du layout.
+    """
+    start = tail.index[0]
+    hist = (tail['MACD'] - tail['Signal_Line']).to_numpy(dtype=float)
+    for trace in fig.data:
+        keep = int(np.searchsorted(pd.DatetimeIndex(trace.x), start))
+        x = np.r_[np.asarray(trace.x, dtype=object)[:keep], tail.index.to_numpy(dtype=object)]
+
+        def splice(old, new):
+            return np.r_[np.asarray(old, dtype=float)[:keep], np.asarray(new, dtype=float)]
+
+        if trace.type == "candlestick":
+            trace.update(x=x, **{k: splice(trace[k], tail[k.capitalize()]) for k in ("open", "high", "low", "close")})
+        elif trace.type == "bar":
+            colors = np.r_[np.asarray(trace.marker.color, dtype=object)[:keep],
+                           np.where(hist >= 0, '#00ff88', '#ff3131')]
+            trace.update(x=x, y=splice(trace.y, hist), marker_color=colors)
+        elif trace.name in TRACE_COLUMNS:
+            trace.update(x=x, y=splice(trace.y, tail[TRACE_COLUMNS[trace.name]]))
+    return fig
+
+
+def patch_anchor(df):
+    """ Indicateurs de l'avant-dernière bougie : le prochain patch les garde tels quels """
+    if len(df) < 2:
+        return None
+    return df[list(TRACE_COLUMNS.values())].iloc[-2].to_numpy(dtype=float)
+
+
+def can_patch(anchor, df, bars):
+    """ Vrai si les indicateurs déjà dessinés (bars bougies) sont inchangés dans df.
+
+    Faux quand le passage au moteur d'indicateurs (50 bougies) ou un réamorçage a recalculé
+    des bougies antérieures à la dernière : la figure doit alors être reconstruite.
+    """
+    current = patch_anchor(df.iloc[:bars])
+    if anchor is None or current is None:
+        return anchor is None and current is None
+    return np.allclose(anchor, current, rtol=1e-9, atol=0.0, equal_nan=True)
+
+
+def _style_layout(fig, dark_mode, height):
+    theme = GRAPH_THEMES[dark_mode]
+    fig.update_layout(height=height, paper_bgcolor=theme["bg"], plot_bgcolor=theme["bg"],
+                      font=dict(color="#aaa" if dark_mode else "#333"), legend=dict(bgcolor='rgba(0,0,0,0)'),
+                      template=theme["template"], margin=dict(l=10, r=10, t=30, b=10))
+    return fig
+
+
+def build_correlation_heatmap(corr, dark_mode=True):
+    """ Matrice de corrélation, échelle divergente de -1 à +1 ; valeurs affichées sur les petits univers """
+    labels = list(corr.columns)
+    fig = go.Figure(go.Heatmap(z=corr.to_numpy(), x=labels, y=labels, zmin=-1, zmax=1, colorscale="RdBu_r",
+                               colorbar=dict(title="ρ"), texttemplate="%{z:.2f}" if len(labels) <= 15 else None,
+                               hovertemplate="%{y} / %{x} : %{z:.2f}<extra></extra>"))
+    fig.update_yaxes(autorange="reversed")
+    return _style_layout(fig, dark_mode, height=min(900, max(400, 28 * len(labels))))
+
+
+def build_rolling_correlation_figure(rolling, dark_mode=True):
+    """ Corrélation glissante de chaque titre (colonnes de rolling) avec le portefeuille """
+    fig = go.Figure([go.Scattergl(x=rolling.index, y=rolling[col].to_numpy(), name=col, mode="lines",
+                                  line=dict(width=1.5)) for col in rolling.columns])
+    fig.add_hline(y=0, line_color="#888", line_dash="dot")
+    fig.update_yaxes(range=[-1, 1])
+    fig.update_layout(hovermode="x unified")
+    return _style_layout(fig, dark_mode, height=420)
@@ -0,0 +1,120 @@
+""" Scoring en lot, sans navigateur (tâche planifiée, worker).
+
+Exemples :
+    python cli.py                                   # univers ACTIONS, score technique, CSV sur la sortie standard
+    python cli.py TTE.PA AIR.PA --period 1y -o scores.csv
+    python cli.py --tickers-file watchlist.txt --full -o scores.json
+    python cli.py --ohlcv-dir data/ -o scores.csv    # fichiers locaux <TICKER>.csv / <TICKER>.parquet
+    python cli.py --backtest --period max            # rendements à terme par bande de signal, sur tout l'historique
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+import engine
+
+COLUMNS = ["ticker", "date", "close", "rsi", "tech_score", "score", "signal", "reasons"]
+
+
+def load_local_ohlcv(directory):
+    """ Historiques OHLCV locaux (format yfinance), un fichier par ticker """
+    frames = {}
+    for name in sorted(os.listdir(directory)):
+        ticker, ext = os.path.splitext(name)
+        path = os.path.join(directory, name)
+        if ext == ".csv":
+            frames[ticker] = pd.read_csv(path, index_col=0, parse_dates=True)
+        elif ext == ".parquet":
+            frames[ticker] = pd.read_parquet(path)
+    return frames
+
+
+def score_frame(ticker, df, fonda=None, news_score=2.5):
+    """ Ligne de résultat ; avec fonda, score pondéré complet, sinon score technique seul """
+    if 'RSI' not in df.columns:
+        df = engine.calculate_indicators(df.copy())
+    last = df.iloc[-1]
+    row = {"ticker": ticker, "date": df.index[-1], "close": last['Close'], "rsi": last['RSI']}
+    if not engine.has_scoring_history(df):
+        score, reasons = engine.calculate_weighted_score(df, fonda or engine.build_fondamentaux(None, 0), news_score)
+        return {**row, "tech_score": None, "score": score, "signal": engine.score_band(score)[0],
+                "reasons": " | ".join(reasons)}
+
+    tech_score, reasons = engine.calculate_technical_score(df)
+    tech_score = round(tech_score, 2)
+    score = tech_score
+    if fonda is not None:
+        score, reasons = engine.calculate_weighted_score(df, fonda, news_score)
+    return {**row, "tech_score": tech_score, "score": score, "signal": engine.score_band(score)[0],
+            "reasons": " | ".join(reasons)}
+
+
+def resolve_tickers(args):
+    tickers = list(args.tickers)
+    if args.tickers_file:
+        with open(args.tickers_file, encoding="utf-8") as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return tickers or list(engine.ACTIONS.values())
+
+
+def backtest(args):
+    """ Statistiques de rendement à terme par bande, score technique évalué sur chaque bougie """
+    frames = load_local_ohlcv(args.ohlcv_dir) if args.ohlcv_dir else None
+    tickers = list(frames) if frames is not None else resolve_tickers(args)
+    horizons = tuple(int(h) for h in args.horizons.split(","))
+    stats, _ = engine.backtest_universe({t: t for t in tickers}, args.period, horizons, frames=frames)
+    return stats.rename_axis("signal").reset_index()
+
+
+def collect(args):
+    if args.ohlcv_dir:
+        return [score_frame(t, df) for t, df in load_local_ohlcv(args.ohlcv_dir).items() if not df.empty]
+
+    tickers = resolve_tickers(args)
+
+    if not args.full:
+        # Indicateurs sur toute la série journalière, puis découpage à la période demandée
+        frames = engine.get_history_batch(tickers, engine.base_period(args.period), engine.get_interval(args.period))
+        return [score_frame(t, engine.slice_period(engine.calculate_indicators(frames[t].copy()), args.period))
+                for t in tickers if t in frames]
+
+    # Score complet : fondamentaux et news par ticker (requête RSS sur le nom de la société si connu)
+    names = {ticker: name for name, ticker in engine.ACTIONS.items()}
+    rows = []
+    for ticker in tickers:
+        df, fonda, _, news_score, errors = engine.fetch_analysis_data(ticker, names.get(ticker, ticker), args.period)
+        if df.empty:
+            print(f"{ticker} : données indisponibles ({', '.join(errors)})", file=sys.stderr)
+            continue
+        rows.append(score_frame(ticker, df, fonda, news_score))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring ESIG'Trade en lot")
+    parser.add_argument("tickers", nargs="*", help="tickers Yahoo (défaut : univers ACTIONS)")
+    parser.add_argument("--tickers-file", help="fichier texte, un ticker par ligne")
+    parser.add_argument("--ohlcv-dir", help="dossier de fichiers OHLCV locaux (aucun appel réseau)")
+    parser.add_argument("--period", default="1y", help="période Yahoo (défaut : 1y)")
+    parser.add_argument("--full", action="store_true", help="score pondéré avec fondamentaux et news")
+    parser.add_argument("--backtest", action="store_true",
+                        help="rendements à terme par bande de signal (score technique sur chaque bougie)")
+    parser.add_argument("--horizons", default=",".join(map(str, engine.BACKTEST_HORIZONS)),
+                        help="horizons du backtest en bougies (défaut : 5,20,60)")
+    parser.add_argument("-o", "--output", help="fichier .csv ou .json (défaut : CSV sur la sortie standard)")
+    parser.add_argument("--format", choices=["csv", "json"], help="format forcé")
+    args = parser.parse_args(argv)
+
+    result = backtest(args) if args.backtest else pd.DataFrame(collect(args), columns=COLUMNS)
+    fmt = args.format or ("json" if args.output and args.output.endswith(".json") else "csv")
+    target = args.output or sys.stdout
+    if fmt == "json":
+        result.to_json(target, orient="records", date_format="iso", force_ascii=False, indent=2)
+    else:
+        result.to_csv(target, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2637 @@
+""" Moteur ESIG'Trade : données de marché, indicateurs et scoring, sans interface.
+
+Importable par l'application Streamlit, un worker, un test ou une tâche planifiée :
+aucun import de Streamlit, et yfinance / feedparser ne sont chargés qu'au premier appel réseau.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Univers d'analyse par défaut
+ACTIONS = {"TotalEnergies": "TTE.PA", "Hermès": "RMS.PA", "Dassault Systèmes": "DSY.PA",
+           "Sopra Steria": "SOP.PA", "Airbus": "AIR.PA", "LVMH": "MC.PA", "Schneider Electric": "SU.PA"}
+
+
+# ==========================================
+# 1. CACHE & STOCKAGE DES COURS
+# ==========================================
+# Durée de vie du cache selon l'intervalle des bougies (secondes)
+HISTORY_TTL = {"2m": 60, "15m": 5 * 60, "1d": 3 * 3600}
+# Budget mémoire du cache des cours, réglable par serveur (Mo)
+HISTORY_CACHE_MAX_BYTES = int(os.environ.get("ESIGTRADE_CACHE_MB", 256)) * 1024 * 1024
+# OHLC en float32 dans le cache (moitié moins de mémoire, ~7 chiffres significatifs)
+COMPACT_FLOAT32 = os.environ.get("ESIGTRADE_FLOAT32", "0") == "1"
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+
+def compact_ohlcv(df, float32=None):
+    """ Représentation mise en cache : OHLC (float32 en option), volume entier, aucune autre colonne.
+
+    Les tableaux sont en lecture seule et partagés par toutes les sessions : get_history renvoie
+    une copie légère, et pandas (copy-on-write) ne duplique une colonne qu'à sa modification.
+    """
+    dtype = np.float32 if (COMPACT_FLOAT32 if float32 is None else float32) else np.float64
+    columns = {col: np.array(df[col], dtype=dtype) for col in PRICE_COLUMNS}
+    volume = np.nan_to_num(df['Volume'].to_numpy(dtype=float)).astype(np.int64)
+    if len(volume) and volume.max() < 2 ** 31:
+        volume = volume.astype(np.int32)
+    columns["Volume"] = volume
+    for values in columns.values():
+        values.flags.writeable = False
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def _buffer_root(arr):
+    while isinstance(arr.base, np.ndarray):
+        arr = arr.base
+    return arr
+
+
+def frame_nbytes(df, seen=None):
+    """ Octets des buffers de df, index compris, sans double compte.
+
+    Une tranche compte son buffer entier. Avec seen (ensemble d'ids partagé entre appels),
+    un buffer déjà compté ailleurs (colonne partagée avec le cache) n'est pas recompté.
+    """
+    seen = set() if seen is None else seen
+    arrays = [df.index.asi8] if isinstance(df.index, pd.DatetimeIndex) else [np.asarray(df.index)]
+    arrays += [df[col].to_numpy() for col in df.columns]
+    total = 0
+    for arr in arrays:
+        root = _buffer_root(arr)
+        if id(root) not in seen:
+            seen.add(id(root))
+            total += root.nbytes
+    return total
+
+
+class PriceHistoryCache:
+    """ Cache LRU partagé par toutes les sessions, borné en mémoire, clé (ticker, period, interval) """
+
+    def __init__(self, max_bytes=HISTORY_CACHE_MAX_BYTES, ttl_map=None):
+        self.max_bytes = max_bytes
+        self.ttl_map = ttl_map or HISTORY_TTL
+        self._entries = OrderedDict()  # clé -> (expiration, nb_octets, df)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, df):
+        """ Met en cache la version compacte de df et la renvoie """
+        ttl = self.ttl_map.get(key[2], max(self.ttl_map.values()))
+        df = compact_ohlcv(df)
+        size = frame_nbytes(df)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return df
+            self._entries[key] = (time.monotonic() + ttl, size, df)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return df
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def entries(self):
+        """ [(clé, nb_octets, df)] des entrées, de la moins à la plus récemment utilisée """
+        with self._lock:
+            return [(key, size, df) for key, (_, size, df) in self._entries.items()]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self.current_bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+
+@functools.cache
+def get_price_cache():
+    """ Instance unique par processus (survit aux reruns et aux sessions) """
+    return PriceHistoryCache()
+
+
+# --- Accès Yahoo : coalescence des requêtes identiques, limitation de débit, backoff ---
+YAHOO_RATE = 2.0  # requêtes par seconde en régime établi (seau à jetons)
+YAHOO_BURST = 10  # rafale maximale
+YAHOO_RETRIES = 3  # nouveaux essais après une réponse de limitation (HTTP 429)
+YAHOO_BACKOFF = 2.0  # secondes de pause après la première limitation, doublées à chaque essai
+
+
+def is_rate_limited(exc):
+    """ Réponse de limitation de Yahoo, qu'elle remonte de yfinance ou de la couche HTTP """
+    return type(exc).__name__ == "YFRateLimitError" or "Too Many Requests" in str(exc)
+
+
+class YahooGateway:
+    """ Point de passage de tous les appels Yahoo, partagé par les sessions et les workers.
+
+    Les appels concurrents de même clé partagent une seule requête et son résultat (en lecture
+    seule). Chaque requête consomme un jeton ; une limitation Yahoo suspend toutes les requêtes
+    le temps du backoff, puis l'appel est retenté.
+    """
+
+    def __init__(self, rate=YAHOO_RATE, burst=YAHOO_BURST, retries=YAHOO_RETRIES, backoff=YAHOO_BACKOFF):
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._inflight = {}  # clé -> Future de la requête en cours
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.calls = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.retried = 0
+
+    def call(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._call_with_retry(fn, *args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _call_with_retry(self, fn, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            self._acquire()
+            try:
+                with self._lock:
+                    self.calls += 1
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.retries:
+                    raise
+                with self._lock:
+                    self.rate_limited += 1
+                    self.retried += 1
+                    self._tokens = 0.0
+                    self._paused_until = max(self._paused_until, time.monotonic() + self.backoff * 2 ** attempt)
+
+    def _acquire(self):
+        """ Attend un jeton (et la fin d'un éventuel backoff) """
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                if not waited:
+                    self.throttled += 1
+                    waited = True
+            with timed("yahoo_throttle"):
+                time.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "throttled": self.throttled,
+                    "rate_limited": self.rate_limited, "retried": self.retried, "inflight": len(self._inflight)}
+
+
+@functools.cache
+def get_yahoo_gateway():
+    return YahooGateway()
+
+
+# Stockage local de l'historique complet (synchronisation incrémentale)
+OHLCV_DB_PATH = "market_data.sqlite"
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+PERIOD_OFFSETS = {"1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3), "6mo": pd.DateOffset(months=6),
+                  "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5)}
+PERIOD_SESSIONS = {"1d": 1, "5d": 5}  # périodes exprimées en séances
+INTRADAY_RETENTION = pd.Timedelta(days=55)  # Yahoo ne sert l'intraday que sur ~60 jours
+FULL_HISTORY = -(2 ** 62)  # couverture "max"
+DAILY_BASE_PERIOD = "max"  # toutes les périodes journalières sont des tranches de cette série
+
+
+class OhlcvStore:
+    """ Historique OHLCV persistant (SQLite) par ticker et intervalle """
+
+    def __init__(self, path=None):
+        self.path = path or OHLCV_DB_PATH
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT, interval TEXT, ts INTEGER, open REAL, high REAL, low REAL, close REAL,
+                volume REAL, dividends REAL, splits REAL, PRIMARY KEY (ticker, interval, ts)) WITHOUT ROWID""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS sync (
+                ticker TEXT, interval TEXT, tz TEXT, covered_from INTEGER, PRIMARY KEY (ticker, interval))""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def state(self, ticker, interval):
+        """ Fuseau, début de couverture, dernier timestamp et nombre de séances stockées (None si vide) """
+        with self._connect() as conn:
+            meta = conn.execute("SELECT tz, covered_from FROM sync WHERE ticker=? AND interval=?",
+                                (ticker, interval)).fetchone()
+            if meta is None:
+                return None
+            tail = conn.execute("""SELECT ts, close, dividends, splits FROM bars WHERE ticker=? AND interval=?
+                                   ORDER BY ts DESC LIMIT 2""", (ticker, interval)).fetchall()
+        if not tail:
+            return None
+        return {"tz": meta[0], "covered_from": meta[1], "last_ts": tail[0][0], "tail": tail[::-1]}
+
+    def upsert(self, ticker, interval, df, covered_from=None):
+        """ Insère ou remplace les bougies (dédoublonnage par timestamp) """
+        if df.empty:
+            return
+        ts = df.index.tz_convert("UTC") if df.index.tz is not None else df.index.tz_localize("UTC")
+        cols = df.reindex(columns=OHLCV_COLUMNS).fillna(0)
+        rows = zip([ticker] * len(df), [interval] * len(df), ts.as_unit("s").asi8.tolist(),
+                   *(cols[c].astype(float).tolist() for c in OHLCV_COLUMNS))
+        tz = str(df.index.tz) if df.index.tz is not None else "UTC"
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if covered_from is None:
+                conn.execute("INSERT OR IGNORE INTO sync VALUES (?, ?, ?, ?)",
+                             (ticker, interval, tz, int(ts[0].timestamp())))
+            else:
+                conn.execute("""INSERT INTO sync VALUES (?, ?, ?, ?) ON CONFLICT(ticker, interval)
+                                DO UPDATE SET tz=excluded.tz, covered_from=MIN(covered_from, excluded.covered_from)""",
+                             (ticker, interval, tz, covered_from))
+
+    def clear(self, ticker, interval):
+        """ Oublie la série (bougies et couverture) """
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM bars WHERE ticker=? AND interval=?", (ticker, interval))
+            conn.execute("DELETE FROM sync WHERE ticker=? AND interval=?", (ticker, interval))
+
+    def prune(self, ticker, interval, before_ts):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM bars WHERE ticker=? AND interval=? AND ts<?", (ticker, interval, before_ts))
+            conn.execute("UPDATE sync SET covered_from=MAX(covered_from, ?) WHERE ticker=? AND interval=?",
+                         (before_ts, ticker, interval))
+
+    def load(self, ticker, interval, tz, since_ts=FULL_HISTORY):
+        with self._connect() as conn:
+            rows = conn.execute("""SELECT ts, open, high, low, close, volume, dividends, splits FROM bars
+                                   WHERE ticker=? AND interval=? AND ts>=? ORDER BY ts""",
+                                (ticker, interval, since_ts)).fetchall()
+        df = pd.DataFrame(rows, columns=["ts"] + OHLCV_COLUMNS)
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.pop("ts"), unit="s", utc=True)).tz_convert(tz)
+        df.index.name = "Date" if interval == "1d" else "Datetime"
+        df["Volume"] = df["Volume"].astype("int64")
+        return df
+
+
+@functools.cache
+def get_ohlcv_store():
+    return OhlcvStore()
+
+
+def _period_start(period, now):
+    """ Début (epoch s) de la fenêtre calendaire demandée ; FULL_HISTORY pour "max" """
+    if period in PERIOD_OFFSETS:
+        return int((now - PERIOD_OFFSETS[period]).timestamp())
+    return FULL_HISTORY
+
+
+def base_period(period):
+    """ Période réellement téléchargée et mise en cache : "max" pour toutes les périodes journalières """
+    return DAILY_BASE_PERIOD if get_interval(period) == "1d" else period
+
+
+def slice_period(df, period, now=None):
+    """ Dernières bougies de df couvrant la fenêtre calendaire de period (sans copie des données).
+
+    Périodes en séances ("1d", "5d") ou "max" : df inchangé.
+    """
+    start = _period_start(period, now or pd.Timestamp.now(tz="UTC"))
+    if start == FULL_HISTORY or df.empty:
+        return df
+    start = pd.Timestamp(start, unit="s", tz="UTC")
+    start = start.tz_convert(df.index.tz) if df.index.tz is not None else start.tz_localize(None)
+    return df.iloc[df.index.searchsorted(start):]
+
+
+def _store_covers(store, state, ticker, period, interval, now):
+    if interval != "1d" and now.timestamp() - state["last_ts"] > INTRADAY_RETENTION.total_seconds():
+        return False  # trou impossible à combler en intraday
+    if period in PERIOD_SESSIONS:
+        stored = store.load(ticker, interval, state["tz"])
+        return stored.index.normalize().nunique() >= PERIOD_SESSIONS[period]
+    return state["covered_from"] <= _period_start(period, now)
+
+
+def _history_readjusted(state, fresh):
+    """ Yahoo a réajusté l'historique (split, dividende) depuis la dernière synchronisation.
+
+    Les cours servis sont ajustés : un événement rétro-ajuste toutes les bougies antérieures.
+    La clôture de l'avant-dernière bougie stockée (définitive) doit être inchangée, et aucune
+    bougie re-téléchargée ne doit porter un événement absent du stockage.
+    """
+    if fresh.empty:
+        return False
+    stored = {ts: (close, dividends, splits) for ts, close, dividends, splits in state["tail"]}
+    events = fresh.reindex(columns=["Dividends", "Stock Splits"]).fillna(0).to_numpy(dtype=float)
+    fresh_ts = (fresh.index.tz_convert("UTC") if fresh.index.tz is not None else fresh.index.tz_localize("UTC"))
+    for ts, close, event in zip(fresh_ts.as_unit("s").asi8.tolist(), fresh["Close"].tolist(), events.tolist()):
+        if ts not in stored:
+            if any(event):
+                return True
+            continue
+        if not np.allclose(event, stored[ts][1:]):
+            return True
+        if ts < state["last_ts"] and not np.isclose(close, stored[ts][0], rtol=1e-6):
+            return True
+    return False
+
+
+def _download_history(stock, ticker, period, interval, now):
+    """ Télécharge toute la période demandée ; renvoie (bougies, début de couverture) """
+    with timed("yahoo_history", ticker=ticker, period=period, interval=interval):
+        fresh = get_yahoo_gateway().call(("history", ticker, period, interval), stock.history,
+                                         period=period, interval=interval)
+    covered_from = _period_start(period, now)
+    if period in PERIOD_SESSIONS and not fresh.empty:
+        covered_from = int(fresh.index[0].timestamp())
+    return fresh, covered_from
+
+
+def sync_history(stock, ticker, period, interval):
+    """ Ne télécharge que les bougies postérieures au dernier timestamp stocké, puis fusionne.
+
+    Si Yahoo a réajusté l'historique entre-temps, la série est oubliée et re-téléchargée en entier.
+    """
+    store = get_ohlcv_store()
+    now = pd.Timestamp.now(tz="UTC")
+    state = store.state(ticker, interval)
+
+    if state is None or not _store_covers(store, state, ticker, period, interval, now):
+        fresh, covered_from = _download_history(stock, ticker, period, interval, now)
+        if fresh.empty:
+            return fresh
+        store.upsert(ticker, interval, fresh, covered_from)
+    else:
+        # Les deux dernières bougies stockées sont re-téléchargées : la dernière peut encore évoluer,
+        # l'avant-dernière, définitive, sert de témoin d'un réajustement
+        since = pd.Timestamp(state["tail"][0][0], unit="s", tz="UTC").tz_convert(state["tz"])
+        try:
+            with timed("yahoo_history", ticker=ticker, since=since, interval=interval):
+                fresh = get_yahoo_gateway().call(("history", ticker, since, interval), stock.history,
+                                                 start=since, interval=interval)
+            if _history_readjusted(state, fresh):
+                fresh, covered_from = _download_history(stock, ticker, period, interval, now)
+                if not fresh.empty:
+                    store.clear(ticker, interval)
+                    store.upsert(ticker, interval, fresh, covered_from)
+            else:
+                store.upsert(ticker, interval, fresh)
+        except Exception:
+            pass  # on sert l'historique local
+
+    if interval != "1d":
+        store.prune(ticker, interval, int((now - INTRADAY_RETENTION).timestamp()))
+
+    state = store.state(ticker, interval)
+    if state is None:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    if period in PERIOD_SESSIONS:
+        df = store.load(ticker, interval, state["tz"])
+        sessions = df.index.normalize()
+        return df[sessions >= sessions.unique()[-PERIOD_SESSIONS[period]]]
+    return store.load(ticker, interval, state["tz"], since_ts=_period_start(period, now))
+
+
+def get_history(stock, ticker, period, interval):
+    """ Historique OHLCV via le cache partagé ; copie légère car les indicateurs ajoutent des colonnes.
+
+    En journalier, toute période est une tranche de la série complète : un changement de période
+    ne déclenche aucun appel réseau.
+    """
+    if interval == "1d" and period != DAILY_BASE_PERIOD:
+        return slice_period(get_history(stock, ticker, DAILY_BASE_PERIOD, interval), period)
+    cache = get_price_cache()
+    key = (ticker, period, interval)
+    df = cache.get(key)
+    if df is None:
+        df = sync_history(stock, ticker, period, interval)
+        if not df.empty:
+            df = cache.put(key, df)
+    return df.copy(deep=False)
+
+
+def refresh_history(ticker, period, interval):
+    """ Synchronisation incrémentale forcée (bougies depuis la dernière stockée), remise en cache.
+
+    Pour le rafraîchissement en arrière-plan : la série en cache est remplacée même si son TTL
+    n'est pas écoulé. period est la période mise en cache (base_period en journalier).
+    """
+    import yfinance as yf
+    df = sync_history(yf.Ticker(ticker), ticker, period, interval)
+    if not df.empty:
+        get_price_cache().put((ticker, period, interval), df)
+
+
+# ==========================================
+# 2. DONNÉES DE MARCHÉ & FONDAMENTAUX
+# ==========================================
+def get_interval(period):
+    """ Intervalle des bougies adapté à la période """
+    if period == "1d":
+        return "2m"
+    elif period == "5d":
+        return "15m"
+    return "1d"
+
+
+def build_fondamentaux(info, last_price, fetched_at=None):
+    """ Extrait consensus et fondamentaux du dict stock.info (valeurs neutres si indisponible).
+
+    fetched_at (timestamp Unix de la collecte) est repris dans "as_of" (None si inconnu).
+    """
+    try:
+        rec_key = info.get('recommendationKey', 'none')
+        target_price = info.get('targetMeanPrice', 0)
+        consensus_score = 2.5
+
+        if rec_key == 'strong_buy':
+            consensus_score = 5
+        elif rec_key == 'buy':
+            consensus_score = 4
+        elif rec_key == 'outperform':
+            consensus_score = 4
+        elif rec_key == 'hold':
+            consensus_score = 2.5
+        elif rec_key == 'underperform':
+            consensus_score = 1
+        elif rec_key == 'sell':
+            consensus_score = 0
+
+        per = info.get('trailingPE') or info.get('forwardPE', 0)
+        div_rate = info.get('dividendRate')
+        if div_rate is None: div_rate = info.get('trailingAnnualDividendRate', 0)
+
+        if div_rate and last_price > 0:
+            div_yield = div_rate / last_price
+        else:
+            div_yield = info.get('dividendYield', 0)
+            if div_yield is None: div_yield = 0
+            if div_yield > 1: div_yield = div_yield / 100
+
+        fonda = {"per": per, "yield": div_yield, "div_amt": div_rate,
+                 "consensus_txt": rec_key.replace('_', ' ').upper(), "consensus_score": consensus_score,
+                 "target_price": target_price,
+                 "as_of": datetime.fromtimestamp(fetched_at) if fetched_at else None}
+    except:
+        fonda = {"per": 0, "yield": 0, "div_amt": 0, "consensus_txt": "N/A", "consensus_score": 2.5, "target_price": 0,
+                 "as_of": None}
+    return fonda
+
+
+# Seuls champs de stock.info lus par build_fondamentaux
+FUNDAMENTAL_FIELDS = ("recommendationKey", "targetMeanPrice", "trailingPE", "forwardPE", "dividendRate",
+                      "trailingAnnualDividendRate", "dividendYield")
+FUNDAMENTALS_TTL = 24 * 3600  # au-delà, la valeur stockée est servie puis revalidée en arrière-plan
+
+
+class FundamentalsStore:
+    """ Derniers fondamentaux valides par ticker (SQLite, même base que les cours), avec leur date de collecte """
+
+    def __init__(self, path=None):
+        self.path = path or OHLCV_DB_PATH
+        self._lock = threading.Lock()
+        self._memo = {}  # ticker -> (fetched_at, champs), évite une lecture SQLite par appel
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS fundamentals (
+                ticker TEXT PRIMARY KEY, fetched_at INTEGER, fields TEXT)""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, ticker):
+        """ (fetched_at, champs) ou None """
+        if ticker in self._memo:
+            return self._memo[ticker]
+        with self._connect() as conn:
+            row = conn.execute("SELECT fetched_at, fields FROM fundamentals WHERE ticker=?", (ticker,)).fetchone()
+        record = (row[0], json.loads(row[1])) if row else None
+        self._memo[ticker] = record
+        return record
+
+    def save(self, ticker, fields, fetched_at=None):
+        record = (int(fetched_at or time.time()), fields)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO fundamentals VALUES (?, ?, ?)",
+                         (ticker, record[0], json.dumps(fields)))
+        self._memo[ticker] = record
+        return record
+
+
+@functools.cache
+def get_fundamentals_store():
+    return FundamentalsStore()
+
+
+@functools.cache
+def get_revalidations():
+    """ Tickers en cours de revalidation (une seule requête stock.info à la fois par ticker) """
+    return set(), threading.Lock()
+
+
+def fetch_fundamentals(stock, ticker):
+    """ stock.info réduit à FUNDAMENTAL_FIELDS et enregistré ; None si Yahoo ne renvoie rien d'exploitable """
+    with timed("yahoo_info", ticker=ticker):
+        info = get_yahoo_gateway().call(("info", ticker), lambda: stock.info)
+    fields = {k: info.get(k) for k in FUNDAMENTAL_FIELDS} if info else {}
+    if not any(v is not None for v in fields.values()):
+        return None  # réponse vide ou partielle : on ne remplace pas le dernier snapshot valide
+    return get_fundamentals_store().save(ticker, fields)
+
+
+def _revalidate_fundamentals(stock, ticker):
+    pending, lock = get_revalidations()
+    try:
+        fetch_fundamentals(stock, ticker)
+    except Exception:
+        pass  # le snapshot précédent reste servi
+    finally:
+        with lock:
+            pending.discard(ticker)
+
+
+def get_fundamentals(stock, ticker):
+    """ Fondamentaux (champs stock.info, date de collecte) en stale-while-revalidate.
+
+    Snapshot récent : servi tel quel. Snapshot périmé : servi immédiatement, revalidé en arrière-plan.
+    Aucun snapshot : collecte synchrone. Renvoie (None, None) si rien n'est disponible.
+    """
+    record = get_fundamentals_store().load(ticker)
+    if record is None:
+        try:
+            record = fetch_fundamentals(stock, ticker)
+        except Exception:
+            record = None
+        return (record[1], record[0]) if record else (None, None)
+
+    fetched_at, fields = record
+    if time.time() - fetched_at > FUNDAMENTALS_TTL:
+        pending, lock = get_revalidations()
+        with lock:
+            start = ticker not in pending
+            pending.add(ticker)
+        if start:
+            get_fetch_pool().submit(_revalidate_fundamentals, stock, ticker)
+    return fields, fetched_at
+
+
+def get_data_and_consensus(ticker, period="2y"):
+    """ Récupère les données avec période et intervalle intelligents """
+    import yfinance as yf
+    stock = yf.Ticker(ticker)
+    df = get_history(stock, ticker, period, get_interval(period))
+
+    if not df.empty:
+        last_price = df['Close'].iloc[-1]
+    else:
+        last_price = 0
+
+    info, fetched_at = get_fundamentals(stock, ticker)
+    return df, build_fondamentaux(info, last_price, fetched_at)
+
+
+# ==========================================
+# 3. ACTUALITÉS & SENTIMENT
+# ==========================================
+POSITIVE_WORDS = ['hausse', 'bondit', 'record', 'achat', 'surperforme', 'contrat', 'succès', 'approbation',
+                  'dividende', 'solide', 'profit']
+NEGATIVE_WORDS = ['chute', 'baisse', 'perte', 'alerte', 'dette', 'procès', 'échec', 'sanction', 'démission',
+                  'faible', 'incertitude']
+NEWS_TTL = 5 * 60  # un flux n'est réinterrogé qu'après ce délai (secondes)
+NEWS_MEMO_SIZE = 5000
+
+
+class FeedCache:
+    """ Flux RSS partagés : TTL puis requête conditionnelle (ETag / If-Modified-Since) """
+
+    def __init__(self, ttl=NEWS_TTL):
+        self.ttl = ttl
+        self._feeds = {}  # url -> {"etag", "modified", "entries", "checked"}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.not_modified = 0
+        self.downloads = 0
+
+    def entries(self, url):
+        with self._lock:
+            cached = self._feeds.get(url)
+            if cached and time.monotonic() - cached["checked"] < self.ttl:
+                self.hits += 1
+                return cached["entries"]
+
+        import feedparser
+        with timed("rss_download", url=url):
+            feed = feedparser.parse(url, etag=cached and cached["etag"], modified=cached and cached["modified"])
+        with self._lock:
+            if cached and (feed.get("status") == 304 or (feed.get("bozo") and not feed.entries)):
+                # Flux inchangé (ou indisponible) : on garde la dernière version valide
+                self.not_modified += 1
+                cached["checked"] = time.monotonic()
+                return cached["entries"]
+            self.downloads += 1
+            self._feeds[url] = {"etag": feed.get("etag"), "modified": feed.get("modified"),
+                                "entries": feed.entries, "checked": time.monotonic()}
+            return feed.entries
+
+
+class SentimentMatcher:
+    """ Une seule expression compilée pour tous les mots-clés, et mémo des titres déjà notés par lien """
+
+    def __init__(self, positive_words, negative_words, memo_size=NEWS_MEMO_SIZE):
+        # Lookahead : toutes les positions de départ sont testées (mots qui se chevauchent),
+        # les mots positifs passent en premier comme dans l'ancien any(...) / elif any(...)
+        words = "|".join(re.escape(w) for w in list(positive_words) + list(negative_words))
+        self._pattern = re.compile(f"(?=({words}))")
+        self._positive = set(positive_words)
+        self._memo = OrderedDict()
+        self._memo_size = memo_size
+        self._lock = threading.Lock()
+
+    def classify(self, title):
+        """ (couleur, modificateur) : vert/+1 si un mot positif, sinon rouge/-1 si un mot négatif """
+        negative = False
+        for match in self._pattern.finditer(title.lower()):
+            if match.group(1) in self._positive:
+                return "green", 1
+            negative = True
+        return ("red", -1) if negative else ("grey", 0)
+
+    def classify_entry(self, link, title):
+        with self._lock:
+            if link in self._memo:
+                self._memo.move_to_end(link)
+                return self._memo[link]
+        result = self.classify(title)
+        with self._lock:
+            self._memo[link] = result
+            if len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+        return result
+
+
+@functools.cache
+def get_feed_cache():
+    return FeedCache()
+
+
+@functools.cache
+def get_sentiment_matcher():
+    return SentimentMatcher(POSITIVE_WORDS, NEGATIVE_WORDS)
+
+
+def get_fresh_news(company_name):
+    query = company_name.replace(" ", "+")
+    rss_url = f"https://news.google.com/rss/search?q={query}+bourse+finance&hl=fr&gl=FR&ceid=FR:fr"
+    entries = get_feed_cache().entries(rss_url)
+    matcher = get_sentiment_matcher()
+    news_list = []
+    time_threshold = datetime.now() - timedelta(hours=48)
+    raw_sentiment = 0;
+    count = 0
+
+    for entry in entries:
+        try:
+            pub_date = datetime.fromtimestamp(time.mktime(entry.published_parsed))
+        except:
+            continue
+        if pub_date < time_threshold: continue
+
+        title = entry.title;
+        link = entry.link;
+        color, score_mod = matcher.classify_entry(link, title)
+
+        raw_sentiment += score_mod;
+        count += 1
+        news_list.append({"title": title, "date": pub_date.strftime('%d/%m %H:%M'), "link": link, "color": color})
+        if count >= 6: break
+
+    if raw_sentiment > 0:
+        final_news_score = 4 + (min(raw_sentiment, 2) * 0.5)
+    elif raw_sentiment < 0:
+        final_news_score = 1
+    else:
+        final_news_score = 2.5
+    return news_list, final_news_score
+
+
+# ==========================================
+# 4. COLLECTE PARALLÈLE
+# ==========================================
+# Délais maximum par appel réseau (secondes), mesurés depuis le lancement en parallèle
+FETCH_TIMEOUTS = {"history": 20, "info": 10, "news": 8}
+
+
+@functools.cache
+def get_fetch_pool():
+    """ Pool de threads partagé pour les appels réseau (Yahoo, RSS) """
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="fetch")
+
+
+def _run_stage(stage, fn, *args):
+    with timed(stage):
+        return fn(*args)
+
+
+def fetch_analysis_data(ticker, company_name, period="2y"):
+    """ Historique, stock.info et news téléchargés en parallèle, avec délai et repli par appel.
+
+    Renvoie (df, fonda, news, news_score, erreurs), df avec ses indicateurs ; un appel en échec
+    ou trop lent est remplacé par sa valeur neutre et signalé dans erreurs.
+    """
+    import yfinance as yf
+    stock = yf.Ticker(ticker)
+    pool = get_fetch_pool()
+    start = time.monotonic()
+    # Contexte copié pour que les mesures des threads remontent dans le relevé du rerun (perf_trace)
+    futures = {
+        "history": pool.submit(contextvars.copy_context().run, _run_stage, "history",
+                               get_indicator_history, stock, ticker, period),
+        "info": pool.submit(contextvars.copy_context().run, _run_stage, "fundamentals",
+                            get_fundamentals, stock, ticker),
+        "news": pool.submit(contextvars.copy_context().run, _run_stage, "news", get_fresh_news, company_name),
+    }
+    fallbacks = {"history": pd.DataFrame(), "info": (None, None), "news": ([], 2.5)}
+    results, errors = {}, []
+    for name, future in futures.items():
+        remaining = max(0.0, FETCH_TIMEOUTS[name] - (time.monotonic() - start))
+        try:
+            results[name] = future.result(timeout=remaining)
+        except Exception as e:
+            future.cancel()
+            results[name] = fallbacks[name]
+            errors.append(f"{name} : {type(e).__name__}")
+
+    df = results["history"]
+    last_price = df['Close'].iloc[-1] if not df.empty else 0
+    news, news_score = results["news"]
+    info, fetched_at = results["info"]
+    return df, build_fondamentaux(info, last_price, fetched_at), news, news_score, errors
+
+
+# ==========================================
+# 5. INDICATEURS TECHNIQUES
+# ==========================================
+def calculate_indicators_pandas(df):
+    """ Implémentation de référence : recalcul complet en pandas """
+    if len(df) < 50:
+        # Sécurité si pas assez de données
+        for col in ['RSI', 'Upper', 'Lower', 'SMA_200', 'SMA_50', 'MACD', 'Signal_Line']:
+            df[col] = 0
+        df['Upper'] = df['Close'];
+        df['Lower'] = df['Close']
+        return df
+
+    # 1. RSI
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+    rs = gain / loss
+    df['RSI'] = 100 - (100 / (1 + rs))
+
+    # 2. Bollinger Bands
+    sma_20 = df['Close'].rolling(20).mean()
+    std_20 = df['Close'].rolling(20).std()
+    df['Upper'] = sma_20 + (2 * std_20)
+    df['Lower'] = sma_20 - (2 * std_20)
+
+    # 3. SMA 200 (Tendance Long terme)
+    df['SMA_200'] = df['Close'].rolling(200).mean()
+
+    # --- NOUVEAUX INDICATEURS ---
+
+    # 4. SMA 50 (Tendance Moyen terme)
+    df['SMA_50'] = df['Close'].rolling(50).mean()
+
+    # 5. MACD (Moving Average Convergence Divergence)
+    # EMA 12 et 26
+    ema12 = df['Close'].ewm(span=12, adjust=False).mean()
+    ema26 = df['Close'].ewm(span=26, adjust=False).mean()
+    df['MACD'] = ema12 - ema26
+    # Ligne de Signal (EMA 9 du MACD)
+    df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
+
+    return df
+
+
+INDICATOR_COLUMNS = ['RSI', 'Upper', 'Lower', 'SMA_200', 'SMA_50', 'MACD', 'Signal_Line']
+ENGINE_RESYNC_BARS = 5000  # recalcul complet périodique pour borner la dérive des sommes glissantes
+ENGINE_MAX_SERIES = 256
+KERNEL_BLOCK = 1024  # taille des blocs de l'EMA vectorisée
+
+
+def _rolling_mean_into(cs, offset, w, dst):
+    """ Moyenne glissante à partir des sommes cumulées (série recentrée sur offset) """
+    dst[:w - 1] = np.nan
+    if len(dst) >= w:
+        np.subtract(cs[w:], cs[:-w], out=dst[w - 1:])
+        dst[w - 1:] /= w
+        dst[w - 1:] += offset
+
+
+def _ema_into(x, span, dst):
+    """ EMA (adjust=False) vectorisée par blocs : e_k = r^(k+1) * (e_-1 + a * sum_j x_j r^-(j+1)) """
+    alpha = 2 / (span + 1)
+    powers = (1 - alpha) ** np.arange(1, KERNEL_BLOCK + 1)
+    inv_powers = 1 / powers
+    dst[0] = x[0]
+    for start in range(1, len(x), KERNEL_BLOCK):
+        seg = x[start:start + KERNEL_BLOCK]
+        k = len(seg)
+        block = dst[start:start + k]
+        np.multiply(seg, inv_powers[:k], out=block)
+        np.cumsum(block, out=block)
+        block *= alpha
+        block += dst[start - 1]
+        block *= powers[:k]
+    return dst
+
+
+def indicator_kernel(close):
+    """ Noyau NumPy : tous les indicateurs en une passe sur un tableau float64 contigu.
+
+    Renvoie un tableau préalloué (len(INDICATOR_COLUMNS), n), une ligne par indicateur.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    n = len(close)
+    out = np.empty((len(INDICATOR_COLUMNS), n))
+    rsi, upper, lower, sma200, sma50, macd, signal = out
+    scratch = np.empty((2, n + 1))
+
+    # Sommes cumulées recentrées sur le premier cours (limite l'erreur d'arrondi)
+    offset = close[0]
+    cs = scratch[0]
+    cs[0] = 0
+    np.cumsum(close - offset, out=cs[1:])
+    _rolling_mean_into(cs, offset, 200, sma200)
+    _rolling_mean_into(cs, offset, 50, sma50)
+    _rolling_mean_into(cs, offset, 20, upper)  # SMA 20 provisoire
+
+    # 1. Bollinger : écart-type en deux passes (écarts à la SMA 20), sans matrice de fenêtres
+    m2, tmp = lower[19:], scratch[1][:n - 19]
+    m2[:] = 0
+    for k in range(20):
+        np.subtract(close[k:n - 19 + k], upper[19:], out=tmp)
+        tmp *= tmp
+        m2 += tmp
+    np.divide(m2, 19, out=m2)
+    np.sqrt(m2, out=m2)
+    m2 *= 2
+    np.subtract(upper[19:], m2, out=tmp)
+    upper[19:] += m2
+    lower[19:] = tmp
+    lower[:19] = np.nan
+
+    # 2. RSI : moyennes simples des hausses/baisses sur 14 variations
+    delta = np.zeros(n)
+    np.subtract(close[1:], close[:-1], out=delta[1:])
+    gain_cs, loss_cs = scratch
+    gain_cs[0] = loss_cs[0] = 0
+    np.cumsum(np.maximum(delta, 0), out=gain_cs[1:])
+    np.cumsum(np.maximum(-delta, 0), out=loss_cs[1:])
+    gain = gain_cs[14:] - gain_cs[:-14]
+    loss = loss_cs[14:] - loss_cs[:-14]
+    # Fenêtres sans baisse (ou sans hausse) : zéro exact comme en pandas
+    loss_nz = np.cumsum(delta < 0)
+    gain_nz = np.cumsum(delta > 0)
+    loss[loss_nz[13:] - np.concatenate(([0], loss_nz[:-14])) == 0] = 0
+    gain[gain_nz[13:] - np.concatenate(([0], gain_nz[:-14])) == 0] = 0
+    rsi[:13] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(gain, loss, out=rsi[13:])
+    rsi[13:] = 100 - 100 / (1 + rsi[13:])
+
+    # 3. MACD et ligne de signal
+    _ema_into(close, 12, macd)
+    _ema_into(close, 26, signal)
+    macd -= signal
+    _ema_into(macd, 9, signal)
+    return out
+
+
+class IndicatorEngine:
+    """ Indicateurs en flux : mise à jour O(1) par bougie ajoutée ou révisée.
+
+    L'état (sommes glissantes, moyenne/M2 de Welford pour l'écart-type, EMA) est
+    initialisé par le noyau NumPy, puis chaque nouvelle bougie ne coûte qu'un pas.
+    """
+
+    _SMA_WINDOWS = (20, 50, 200)
+    _A12, _A26, _A9 = 2 / 13, 2 / 27, 2 / 10
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.n = 0
+        self.index = None
+        self.appended = 0
+        self._shared = 0  # bougies déjà remises en vues par update : plus jamais réécrites en place
+
+    def update(self, df):
+        """ df avec ses indicateurs : vues en lecture seule sur les buffers du moteur, sans copie """
+        self.sync(df)
+        views = {}
+        for col in INDICATOR_COLUMNS:
+            views[col] = self._out[col][:self.n]
+            views[col].flags.writeable = False
+        self._shared = self.n
+        indicators = pd.DataFrame(views, index=df.index, copy=False)
+        return pd.concat([df.drop(columns=INDICATOR_COLUMNS, errors="ignore"), indicators], axis=1)
+
+    def sync(self, df):
+        """ Met l'état à jour avec les bougies de df, sans écrire de colonnes (lecture : latest) """
+        close = df['Close'].to_numpy(dtype=float)
+        n_old = self.n
+        if (n_old == 0 or len(close) < n_old or len(close) - n_old > ENGINE_RESYNC_BARS
+                or self.appended > ENGINE_RESYNC_BARS or np.isnan(close).any()
+                or not df.index[:n_old].equals(self.index[:n_old])
+                or not np.array_equal(close[:n_old - 1], self._close[:n_old - 1])):
+            self._bootstrap(df, close)
+        else:
+            if close[n_old - 1] != self._close[n_old - 1]:
+                self._revise_last(close[n_old - 1])
+            for x in close[n_old:]:
+                self._append(x)
+            self.index = df.index
+
+    def _overlap(self, df):
+        """ Position dans df de la dernière bougie traitée, None si df ne la recouvre pas avec sa précédente """
+        if self.n < 2:
+            return None
+        pos = df.index.searchsorted(self.index[-1])
+        if (0 < pos < len(df) and df.index[pos] == self.index[-1]
+                and float(df['Close'].iat[pos - 1]) == self._close[self.n - 2]):
+            return pos
+        return None
+
+    def overlaps(self, df):
+        """ Vrai si extend(df) peut prolonger la série sans la réinitialiser """
+        return self._overlap(df) is not None
+
+    def extend(self, df):
+        """ Comme sync, pour une fenêtre glissante (début de df décalé à chaque téléchargement).
+
+        Seules les bougies de df à partir de la dernière traitée sont reprises : la série garde son
+        début, dont dépendent EMA et MACD, et le coût reste O(nouvelles bougies). df peut donc ne
+        contenir que les dernières séances (voir overlaps). Sans recouvrement ou si l'avant-dernière
+        clôture a changé (historique réajusté), df est repris en entier.
+        Renvoie False si l'état a été réinitialisé.
+        """
+        pos = self._overlap(df)
+        if pos is not None:
+            tail = df['Close'].to_numpy(dtype=float)[pos:]
+            if not np.isnan(tail).any() and self.appended + len(tail) <= ENGINE_RESYNC_BARS:
+                if tail[0] != self._close[self.n - 1]:
+                    self._revise_last(tail[0])
+                for x in tail[1:]:
+                    self._append(x)
+                self.index = self.index.append(df.index[pos + 1:])
+                return True
+        self.sync(df)
+        return False
+
+    def latest(self, k=2):
+        """ {colonne: valeurs des k dernières bougies} pour Close et les indicateurs (copies) """
+        start = max(self.n - k, 0)
+        return {"Close": self._close[start:self.n].copy(),
+                **{col: self._out[col][start:self.n].copy() for col in INDICATOR_COLUMNS}}
+
+    # --- Initialisation depuis le noyau NumPy ---
+    def _bootstrap(self, df, close):
+        ref = indicator_kernel(close)
+        n = len(close)
+        capacity = n + max(n // 4, 256)  # marge pour les ajouts, puis doublement (_grow)
+        self._close = np.empty(capacity)
+        self._close[:n] = close
+        self._out = {col: np.full(capacity, np.nan) for col in INDICATOR_COLUMNS}
+        for col, values in zip(INDICATOR_COLUMNS, ref):
+            self._out[col][:n] = values
+
+        # État après n-1 bougies, la dernière est rejouée pour pouvoir être révisée
+        m = n - 1
+        c = self._close
+        self._sums = {w: c[max(0, m - w):m].sum() for w in self._SMA_WINDOWS}
+        self._gain = self._loss = 0.0
+        self._loss_nz = 0
+        for j in range(max(0, m - 14), m):
+            g, l = self._gain_loss(j)
+            self._gain += g; self._loss += l; self._loss_nz += l > 0
+        win = c[max(0, m - 20):m]
+        self._wn, self._wmean = len(win), win.mean()
+        self._wm2 = ((win - self._wmean) ** 2).sum()
+        self._ema12 = _ema_into(c[:m], 12, np.empty(m))[-1]
+        self._ema26 = _ema_into(c[:m], 26, np.empty(m))[-1]
+        self._signal = ref[INDICATOR_COLUMNS.index('Signal_Line'), m - 1]
+        self.n = m
+        self.appended = 0
+        self._shared = 0
+        self._append(close[-1])
+        self.index = df.index
+
+    # --- Pas incrémental ---
+    def _gain_loss(self, j):
+        if j == 0:
+            return 0.0, 0.0
+        d = self._close[j] - self._close[j - 1]
+        return (d, 0.0) if d > 0 else (0.0, -d)
+
+    def _state(self):
+        return (dict(self._sums), self._gain, self._loss, self._loss_nz, self._wn, self._wmean, self._wm2,
+                self._ema12, self._ema26, self._signal)
+
+    def _append(self, x):
+        i = self.n
+        if i == len(self._close):
+            self._grow()
+        self._before_last = self._state()
+        c = self._close
+        c[i] = x
+        out = self._out
+
+        # RSI (moyennes simples sur 14 variations)
+        g, l = self._gain_loss(i)
+        self._gain += g; self._loss += l; self._loss_nz += l > 0
+        if i >= 14:
+            g, l = self._gain_loss(i - 14)
+            self._gain -= g; self._loss -= l; self._loss_nz -= l > 0
+        if i >= 13:
+            loss = self._loss if self._loss_nz else 0.0
+            if loss == 0:
+                out['RSI'][i] = 100.0 if self._gain > 0 else np.nan
+            else:
+                out['RSI'][i] = 100 - 100 / (1 + self._gain / loss)
+
+        # Moyennes mobiles
+        for w in self._SMA_WINDOWS:
+            self._sums[w] += x
+            if i >= w:
+                self._sums[w] -= c[i - w]
+        out['SMA_50'][i] = self._sums[50] / 50 if i >= 49 else np.nan
+        out['SMA_200'][i] = self._sums[200] / 200 if i >= 199 else np.nan
+
+        # Écart-type 20 (Welford glissant)
+        if self._wn == 20:
+            y = c[i - 20]
+            self._wn -= 1
+            d = y - self._wmean
+            self._wmean -= d / self._wn
+            self._wm2 -= d * (y - self._wmean)
+        self._wn += 1
+        d = x - self._wmean
+        self._wmean += d / self._wn
+        self._wm2 += d * (x - self._wmean)
+        if i >= 19:
+            sma20 = self._sums[20] / 20
+            std = np.sqrt(max(self._wm2, 0.0) / 19)
+            out['Upper'][i] = sma20 + 2 * std
+            out['Lower'][i] = sma20 - 2 * std
+        else:
+            out['Upper'][i] = out['Lower'][i] = np.nan
+
+        # MACD
+        if i == 0:
+            self._ema12 = self._ema26 = x
+            self._signal = 0.0
+        else:
+            self._ema12 += self._A12 * (x - self._ema12)
+            self._ema26 += self._A26 * (x - self._ema26)
+            macd = self._ema12 - self._ema26
+            self._signal += self._A9 * (macd - self._signal)
+        out['MACD'][i] = self._ema12 - self._ema26
+        out['Signal_Line'][i] = self._signal
+
+        self.n += 1
+        self.appended += 1
+
+    def _revise_last(self, x):
+        (self._sums, self._gain, self._loss, self._loss_nz, self._wn, self._wmean, self._wm2,
+         self._ema12, self._ema26, self._signal) = self._before_last
+        self.n -= 1
+        if self._shared > self.n:
+            # La bougie révisée figure dans des vues déjà remises (instantanés, reruns précédents)
+            self._out = {col: arr.copy() for col, arr in self._out.items()}
+            self._shared = 0
+        self._append(x)
+
+    @property
+    def nbytes(self):
+        """ Mémoire des buffers (cours et indicateurs, capacité réservée comprise) """
+        if self.n == 0:
+            return 0
+        return self._close.nbytes + sum(arr.nbytes for arr in self._out.values())
+
+    def _grow(self):
+        capacity = 2 * len(self._close)
+        self._close = np.resize(self._close, capacity)
+        self._out = {col: np.resize(arr, capacity) for col, arr in self._out.items()}
+
+
+@functools.cache
+def get_indicator_engines():
+    """ Moteurs par série (ticker, période), partagés entre sessions, bornés en LRU """
+    return OrderedDict(), threading.Lock()
+
+
+def calculate_indicators(df, key=None):
+    """ Indicateurs techniques : noyau NumPy, ou moteur incrémental si une clé de série est fournie """
+    if len(df) < 50:
+        return calculate_indicators_pandas(df)
+    if key is None:
+        for col, values in zip(INDICATOR_COLUMNS, indicator_kernel(df['Close'].to_numpy())):
+            df[col] = values
+        return df
+
+    engines, registry_lock = get_indicator_engines()
+    with registry_lock:
+        engine = engines.get(key)
+        if engine is None:
+            engine = engines[key] = IndicatorEngine()
+        engines.move_to_end(key)
+        while len(engines) > ENGINE_MAX_SERIES:
+            engines.popitem(last=False)
+    with engine.lock:
+        return engine.update(df)
+
+
+def get_indicator_history(stock, ticker, period):
+    """ Historique de la période avec ses indicateurs.
+
+    En journalier, les indicateurs sont calculés sur toute la série (moteur incrémental de clé
+    (ticker, "max")) puis découpés : SMA 200 et EMA déjà amorcées sur les fenêtres courtes.
+    """
+    base = base_period(period)
+    df = get_history(stock, ticker, base, get_interval(period))
+    if df.empty:
+        return df
+    with timed("indicators", ticker=ticker, bars=len(df)):
+        df = calculate_indicators(df, key=(ticker, base))
+    window = slice_period(df, period)
+    if len(window) < len(df):
+        # Indicateurs recopiés sur la tranche : elle ne retient pas les colonnes de toute la série
+        for col in INDICATOR_COLUMNS:
+            window[col] = window[col].to_numpy().copy()
+    return window
+
+
+# --- Multi-horizons : bougies hebdomadaires et mensuelles rééchantillonnées localement ---
+TIMEFRAMES = {"Semaine": "W", "Mois": "M"}
+
+
+def resample_ohlcv(df, rule):
+    """ Bougies d'un horizon supérieur ("W" semaine, "M" mois), agrégées en NumPy (reduceat).
+
+    Chaque bougie est datée de la première séance de sa période (convention Yahoo "1wk"/"1mo") :
+    l'étiquette de la période en cours ne change pas quand des séances s'y ajoutent, et le moteur
+    incrémental ne fait que réviser sa dernière bougie.
+    """
+    if df.empty:
+        return df[PRICE_COLUMNS + ["Volume"]]
+    local = df.index.tz_localize(None) if df.index.tz is not None else df.index
+    if rule == "W":
+        # Semaines du lundi au dimanche (le 01/01/1970 est un jeudi)
+        bucket = (local.to_numpy().astype("datetime64[D]").astype(np.int64) + 3) // 7
+    else:
+        bucket = local.to_numpy().astype("datetime64[M]").astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] - 1
+    return pd.DataFrame({"Open": df['Open'].to_numpy()[starts],
+                         "High": np.fmax.reduceat(df['High'].to_numpy(), starts),
+                         "Low": np.fmin.reduceat(df['Low'].to_numpy(), starts),
+                         "Close": df['Close'].to_numpy()[ends],
+                         "Volume": np.add.reduceat(df['Volume'].to_numpy(), starts, dtype=np.int64)},
+                        index=df.index[starts])
+
+
+@functools.cache
+def get_timeframe_cache():
+    """ Séries rééchantillonnées avec indicateurs, par (ticker, horizon), bornées en LRU """
+    return OrderedDict(), threading.Lock()
+
+
+def get_timeframe_indicators(ticker, period):
+    """ {horizon: bougies avec indicateurs} dérivées de la série journalière déjà en cache.
+
+    Aucun appel réseau : {} en intraday ou si la série n'est pas (ou plus) en cache. Le résultat
+    est réutilisé tant que la série source est la même ; sinon rééchantillonnage et mise à jour
+    incrémentale des indicateurs (clé (ticker, "max", horizon)).
+    """
+    if get_interval(period) != "1d":
+        return {}
+    base = get_price_cache().get((ticker, DAILY_BASE_PERIOD, "1d"))
+    if base is None:
+        return {}
+    source = _buffer_root(base['Close'].to_numpy())
+    entries, lock = get_timeframe_cache()
+    frames = {}
+    for label, rule in TIMEFRAMES.items():
+        key = (ticker, rule)
+        with lock:
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+        if entry is not None and entry[0] is source and entry[1] == len(base):
+            frames[label] = entry[2]
+            continue
+        with timed("timeframe", ticker=ticker, rule=rule):
+            df = calculate_indicators(resample_ohlcv(base, rule), key=(ticker, DAILY_BASE_PERIOD, rule))
+        with lock:
+            entries[key] = (source, len(base), df)
+            while len(entries) > ENGINE_MAX_SERIES:
+                entries.popitem(last=False)
+        frames[label] = df
+    return frames
+
+
+# ==========================================
+# 6. SCORING
+# ==========================================
+def calculate_technical_score(df):
+    """ Score technique sur 5 (RSI, Bollinger, SMA 50/200, MACD) et justifications """
+    last = df.iloc[-1]
+    prev = df.iloc[-2]  # Pour voir les croisements récents
+    reasons = []
+    tech_points = 0
+
+    # --- RSI (Max 1 pt) ---
+    if pd.notna(last['RSI']):
+        if last['RSI'] < 35:
+            tech_points += 1;
+            reasons.append("Tech: RSI en Survente (Rebond probable)")
+        elif last['RSI'] > 70:
+            tech_points -= 1;
+            reasons.append("Tech: RSI en Surachat (Correction probable)")
+        else:
+            tech_points += 0.5;
+            reasons.append(f"Tech: RSI Neutre ({int(last['RSI'])})")
+
+    # --- Bollinger (Max 1.5 pts) ---
+    if pd.notna(last['Lower']):
+        if last['Close'] < last['Lower']:
+            tech_points += 1.5;
+            reasons.append("Tech: Prix sous Bollinger Basse (Signal Achat fort)")
+        elif last['Close'] > last['Upper']:
+            tech_points -= 1;
+            reasons.append("Tech: Prix sur Bollinger Haute (Signal Vente)")
+        else:
+            tech_points += 0.5;
+            reasons.append("Tech: Volatilité normale (Bandes Bollinger)")
+
+    # --- SMA 50 & 200 (Max 1.5 pts) ---
+    if pd.notna(last['SMA_50']):
+        if last['Close'] > last['SMA_50']:
+            tech_points += 0.5;
+            reasons.append("Tech: Prix > Moyenne Mobile 50j (Hausse moyen terme)")
+        else:
+            reasons.append("Tech: Prix < Moyenne Mobile 50j (Pression baissière)")
+
+    if pd.notna(last['SMA_200']):
+        if last['Close'] > last['SMA_200']:
+            tech_points += 0.5;
+            reasons.append("Tech: Prix > SMA 200 (Tendance fond Haussière)")
+
+        # Golden Cross check
+        if last['SMA_50'] > last['SMA_200'] and prev['SMA_50'] <= prev['SMA_200']:
+            tech_points += 1;
+            reasons.append("Tech: 🌟 GOLDEN CROSS DÉTECTÉE (SMA 50 croise SMA 200)")
+        elif last['SMA_50'] > last['SMA_200']:
+            tech_points += 0.25;
+            reasons.append("Tech: Configuration Golden Cross active")
+
+    # --- MACD (Max 1 pt) ---
+    if pd.notna(last['MACD']):
+        if last['MACD'] > last['Signal_Line']:
+            tech_points += 1;
+            reasons.append("Tech: MACD au-dessus du Signal (Momentum Acheteur)")
+        else:
+            tech_points -= 1;
+            reasons.append("Tech: MACD sous le Signal (Momentum Vendeur)")
+
+    # Normalisation du score technique sur 5
+    # Total potentiel max ~ 5.5 points. On divise par 5.5 et remet sur 5
+    tech_score_5 = (max(0, tech_points) / 5.5) * 5
+    return tech_score_5, reasons
+
+
+def has_scoring_history(df):
+    """ Indicateurs exploitables : 50 bougies, ou tranche d'une série plus longue (SMA 50 déjà amorcée) """
+    return len(df) >= 50 or (len(df) >= 2 and df['SMA_50'].iloc[-1] > 0)
+
+
+def calculate_weighted_score(df, fonda, news_score):
+    if not has_scoring_history(df): return 2.5, ["Données insuffisantes pour l'analyse technique complète"]
+
+    tech_score_5, reasons = calculate_technical_score(df)
+
+    # Analyse Fondamentale
+    fund_points = 0
+    if fonda['per'] > 0 and fonda['per'] < 15:
+        fund_points += 1;
+        reasons.append(f"Fonda: Action sous-évaluée (PER {fonda['per']:.1f})")
+    elif fonda['per'] > 35:
+        fund_points -= 1;
+        reasons.append(f"Fonda: Valorisation élevée (PER {fonda['per']:.1f})")
+    else:
+        reasons.append(f"Fonda: PER Standard ({fonda['per']:.1f})")
+
+    if fonda['yield'] > 0.035:
+        fund_points += 1;
+        reasons.append(f"Fonda: Dividende attractif ({fonda['yield'] * 100:.1f}%)")
+
+    fund_score_5 = (max(0, fund_points) / 2) * 5
+    reasons.append(f"Consensus: Analystes '{fonda['consensus_txt']}'")
+
+    # Calcul Final
+    # Tech 40%, Consensus 20%, Fonda 20%, News 20%
+    final_score = (
+                (tech_score_5 * 0.40) + (fonda['consensus_score'] * 0.20) + (fund_score_5 * 0.20) + (news_score * 0.20))
+
+    return round(final_score, 2), reasons
+
+
+# Poids de chaque horizon dans le score multi-horizons (renormalisés sur les horizons exploitables)
+TIMEFRAME_WEIGHTS = {"Jour": 0.5, "Semaine": 0.3, "Mois": 0.2}
+
+
+def calculate_multi_timeframe_score(frames):
+    """ Score technique par horizon ({horizon: df avec indicateurs}) et leur moyenne pondérée.
+
+    Renvoie ({horizon: score}, score combiné) ; un horizon trop court est ignoré, None si aucun.
+    """
+    scores = {label: round(calculate_technical_score(df)[0], 2)
+              for label, df in frames.items() if has_scoring_history(df)}
+    if not scores:
+        return scores, None
+    total = sum(TIMEFRAME_WEIGHTS[label] for label in scores)
+    return scores, round(sum(TIMEFRAME_WEIGHTS[label] * score for label, score in scores.items()) / total, 2)
+
+
+# Bandes de signal (libellé, type d'encadré Streamlit), indexées par score_band_codes
+SCORE_BANDS = [("🚀 ACHAT FORT (STRONG BUY)", "success"), ("↗️ ACCUMULER (BUY)", "info"),
+               ("⏸️ NEUTRE (HOLD)", "warning"), ("↘️ ALLÉGER (SELL)", "warning"),
+               ("⛔ VENTE FORTE (STRONG SELL)", "error")]
+
+
+def score_band_codes(scores):
+    """ Indice de bande dans SCORE_BANDS pour un score ou un tableau de scores (NaN -> -1) """
+    scores = np.asarray(scores, dtype=float)
+    with np.errstate(invalid='ignore'):
+        codes = np.select([scores >= 3.8, scores >= 3.0, scores <= 1.5, scores <= 2.2], [0, 1, 4, 3], default=2)
+    return np.where(np.isnan(scores), -1, codes)
+
+
+def score_band(score):
+    """ Libellé du signal et type d'encadré Streamlit associé """
+    return SCORE_BANDS[int(score_band_codes(score))]
+
+
+# --- Backtest : score technique évalué sur chaque bougie ---
+BACKTEST_HORIZONS = (5, 20, 60)  # rendements à terme, en bougies
+MIN_SCORING_BARS = 50  # en dessous, calculate_weighted_score renvoie le score neutre
+
+# Drapeau -> points, même barème que calculate_technical_score
+TECH_POINTS = {
+    "rsi_oversold": 1, "rsi_overbought": -1, "rsi_neutral": 0.5,
+    "bb_below": 1.5, "bb_above": -1, "bb_inside": 0.5,
+    "above_sma50": 0.5, "below_sma50": 0,
+    "above_sma200": 0.5, "golden_cross": 1, "golden_cross_active": 0.25,
+    "macd_bullish": 1, "macd_bearish": -1,
+}
+
+
+def technical_flags(df):
+    """ Drapeaux du barème technique pour chaque bougie, en opérations sur tableaux entiers.
+
+    La bougie i est évaluée comme calculate_technical_score(df.iloc[:i + 1]) : les indicateurs
+    sont causaux et les comparaisons avec NaN valent faux, comme les branches pd.notna.
+    """
+    close = df['Close'].to_numpy(dtype=float)
+    rsi, lower, upper, sma50, sma200, macd, signal = (
+        df[c].to_numpy(dtype=float) for c in ('RSI', 'Lower', 'Upper', 'SMA_50', 'SMA_200', 'MACD', 'Signal_Line'))
+    prev50, prev200 = np.r_[np.nan, sma50[:-1]], np.r_[np.nan, sma200[:-1]]
+
+    with np.errstate(invalid='ignore'):
+        oversold, overbought = rsi < 35, rsi > 70
+        below_bb, above_bb = close < lower, close > upper
+        above50 = close > sma50
+        trend = sma50 > sma200
+        cross = trend & (prev50 <= prev200)
+        bullish = macd > signal
+    has_rsi, has_bb = ~np.isnan(rsi), ~np.isnan(lower)
+    has50, has200, has_macd = ~np.isnan(sma50), ~np.isnan(sma200), ~np.isnan(macd)
+
+    return {
+        "rsi_oversold": oversold,
+        "rsi_overbought": overbought,
+        "rsi_neutral": has_rsi & ~oversold & ~overbought,
+        "bb_below": below_bb,
+        "bb_above": has_bb & ~below_bb & above_bb,
+        "bb_inside": has_bb & ~below_bb & ~above_bb,
+        "above_sma50": above50,
+        "below_sma50": has50 & ~above50,
+        "above_sma200": close > sma200,
+        "golden_cross": has200 & cross,
+        "golden_cross_active": has200 & trend & ~cross,
+        "macd_bullish": bullish,
+        "macd_bearish": has_macd & ~bullish,
+    }
+
+
+def backtest_technical_score(df, horizons=BACKTEST_HORIZONS):
+    """ Score technique, drapeaux, bande et rendements à terme pour chaque bougie.
+
+    df doit contenir les colonnes de calculate_indicators. Score NaN (bande -1) pendant
+    les MIN_SCORING_BARS - 1 premières bougies ; Fwd_h = Close[i + h] / Close[i] - 1.
+    """
+    flags = technical_flags(df)
+    points = np.zeros(len(df))
+    for name, flag in flags.items():
+        if TECH_POINTS[name]:
+            points += TECH_POINTS[name] * flag
+    score = np.maximum(points, 0) / 5.5 * 5
+    score[:MIN_SCORING_BARS - 1] = np.nan
+
+    out = pd.DataFrame(flags, index=df.index)
+    codes = score_band_codes(score)
+    out.insert(0, "Score", score)
+    out.insert(1, "Band", codes)
+    out.insert(2, "Signal", pd.Categorical.from_codes(codes, categories=[label for label, _ in SCORE_BANDS]))
+    close = df['Close'].to_numpy(dtype=float)
+    for h in horizons:
+        fwd = np.full(len(close), np.nan)
+        if h < len(close):
+            fwd[:-h] = close[h:] / close[:-h] - 1
+        out[f"Fwd_{h}"] = fwd
+    return out
+
+
+def band_forward_stats(backtests, horizons=BACKTEST_HORIZONS):
+    """ Par bande : nombre d'observations, rendement moyen / médian et taux de hausse à chaque horizon """
+    frame = pd.concat(backtests) if isinstance(backtests, (list, tuple)) else backtests
+    frame = frame[frame["Band"] >= 0]
+    stats = {}
+    for h in horizons:
+        fwd = frame[f"Fwd_{h}"]
+        grouped = fwd.groupby(frame["Signal"], observed=False)
+        stats[f"n_{h}"] = grouped.count()
+        stats[f"mean_{h}"] = grouped.mean()
+        stats[f"median_{h}"] = grouped.median()
+        stats[f"hit_{h}"] = (fwd > 0).where(fwd.notna()).groupby(frame["Signal"], observed=False).mean()
+    return pd.DataFrame(stats)
+
+
+def backtest_universe(actions, period="max", horizons=BACKTEST_HORIZONS, frames=None):
+    """ Backtest de tout l'univers ({nom: ticker}) : un téléchargement groupé, puis noyau NumPy par ticker.
+
+    frames ({ticker: OHLCV}) évite le téléchargement (fichiers locaux).
+    Renvoie (stats par bande, {ticker: backtest}).
+    """
+    if frames is None:
+        frames = get_history_batch(list(actions.values()), period, get_interval(period))
+    backtests = {}
+    for ticker in actions.values():
+        df = frames.get(ticker)
+        if df is None or len(df) < MIN_SCORING_BARS:
+            continue
+        backtests[ticker] = backtest_technical_score(calculate_indicators(df.copy(deep=False)), horizons)
+    if not backtests:
+        return pd.DataFrame(), backtests
+    return band_forward_stats(list(backtests.values()), horizons), backtests
+
+
+BATCH_EMPTY_TTL = 15 * 60  # secondes avant de redemander un ticker pour lequel Yahoo n'a rien renvoyé
+
+
+@functools.cache
+def get_empty_batch_series():
+    """ (ticker, period, interval) -> échéance : séries vides au dernier téléchargement groupé, et verrou """
+    return {}, threading.Lock()
+
+
+def get_history_batch(tickers, period, interval):
+    """ Historiques de plusieurs tickers en une seule requête Yahoo ; les séries en cache ne sont pas retéléchargées.
+
+    Un ticker sans données (radié, symbole erroné) n'est pas redemandé avant BATCH_EMPTY_TTL.
+    """
+    cache = get_price_cache()
+    empty, empty_lock = get_empty_batch_series()
+    now = time.monotonic()
+    frames, missing = {}, []
+    for ticker in tickers:
+        key = (ticker, period, interval)
+        df = cache.get(key)
+        if df is not None:
+            frames[ticker] = df
+            continue
+        with empty_lock:
+            if empty.get(key, 0) > now:
+                continue
+            empty.pop(key, None)
+        missing.append(ticker)
+
+    if missing:
+        for ticker, df in download_batch(missing, period, interval).items():
+            if df is None:
+                # Mémorisé comme absent : ni le screener ni les alertes ne le redemandent à chaque passe
+                with empty_lock:
+                    empty[(ticker, period, interval)] = time.monotonic() + BATCH_EMPTY_TTL
+                continue
+            frames[ticker] = cache.put((ticker, period, interval), df)
+    return frames
+
+
+def download_batch(tickers, period, interval):
+    """ Une requête Yahoo groupée, sans cache : {ticker: OHLCV, ou None si Yahoo n'a rien renvoyé} """
+    import yfinance as yf
+    with timed("yahoo_download", tickers=len(tickers), period=period, interval=interval):
+        raw = get_yahoo_gateway().call(("download", tuple(tickers), period, interval), yf.download, tickers,
+                                       period=period, interval=interval, group_by='ticker', auto_adjust=True,
+                                       threads=True, progress=False)
+    frames = {}
+    for ticker in tickers:
+        if isinstance(raw.columns, pd.MultiIndex):
+            df = raw[ticker] if ticker in raw.columns.get_level_values(0) else None
+        else:
+            df = raw
+        if df is not None and 'Close' in df:
+            df = df.dropna(subset=['Close'])
+        frames[ticker] = None if df is None or 'Close' not in df or df.empty else df
+    return frames
+
+
+def screen_universe(actions, period="1y"):
+    """ Classement de tout l'univers : un téléchargement groupé, puis noyau NumPy et score technique par ticker.
+
+    Pas d'appel stock.info ni RSS par ticker : le classement porte sur le score technique.
+    """
+    base = base_period(period)
+    frames = get_history_batch(list(actions.values()), base, get_interval(period))
+    rows = []
+    for name, ticker in actions.items():
+        df = frames.get(ticker)
+        if df is None or len(df) < 50:
+            continue
+        with timed("indicators"):
+            df = slice_period(calculate_indicators(df.copy(deep=False)), period)
+        if len(df) < 2:
+            continue
+        with timed("scoring"):
+            score, reasons = calculate_technical_score(df)
+        score = round(score, 2)
+        last, prev = df['Close'].iloc[-1], df['Close'].iloc[-2]
+        rows.append({"Actif": name, "Ticker": ticker, "Cours": last, "Var. %": (last / prev - 1) * 100,
+                     "RSI": df['RSI'].iloc[-1], "Score": score, "Signal": score_band(score)[0],
+                     "Raisons": " · ".join(r.removeprefix("Tech: ") for r in reasons if r.startswith("Tech"))})
+    columns = ["Actif", "Ticker", "Cours", "Var. %", "RSI", "Score", "Signal", "Raisons"]
+    return pd.DataFrame(rows, columns=columns).sort_values("Score", ascending=False, ignore_index=True)
+
+
+# ==========================================
+# 7. PRÉPARATION DES GRAPHIQUES
+# ==========================================
+MAX_CHART_POINTS = 1500  # ~ 1 point par pixel sur la largeur utile du graphique
+CHART_RAW_TAIL = 60  # dernières bougies toujours envoyées sans agrégation
+
+
+def _first_in_bucket(mask, bucket_id):
+    """ Index (dans la série) de la première position vraie de chaque bucket """
+    positions = np.flatnonzero(mask)
+    _, first = np.unique(bucket_id[positions], return_index=True)
+    return positions[first]
+
+
+def downsample_for_chart(df, max_points=MAX_CHART_POINTS, raw_tail=CHART_RAW_TAIL):
+    """ Réduit l'historique à ~max_points points pour le navigateur.
+
+    Bougies et Bollinger : agrégation OHLC / enveloppe par bucket (plus haut et plus bas exacts).
+    Courbes (SMA, RSI, MACD) : min-max par bucket, aux dates réelles des extrêmes.
+    Les raw_tail dernières bougies restent intactes. Sous le seuil, la série est renvoyée telle quelle.
+    """
+    n = len(df)
+    x = df.index
+    hist = (df['MACD'] - df['Signal_Line']).to_numpy(dtype=float)
+    line_cols = ['SMA_200', 'SMA_50', 'RSI', 'MACD', 'Signal_Line']
+    if n <= max_points:
+        return {"x": x, "open": df['Open'], "high": df['High'], "low": df['Low'], "close": df['Close'],
+                "upper": df['Upper'], "lower": df['Lower'], "hist": hist,
+                "lines": {col: (x, df[col]) for col in line_cols}}
+
+    head = n - raw_tail
+    bucket = -(-head // (max_points - raw_tail))  # taille de bucket (division entière arrondie au-dessus)
+    remainder = head % bucket
+    starts = np.arange(remainder, head, bucket)
+    if remainder:
+        starts = np.r_[0, starts]
+    ends = np.r_[starts[1:], head]
+    tail = np.arange(head, n)
+
+    def ohlc(col, reducer):
+        values = df[col].to_numpy(dtype=float)
+        return np.r_[reducer.reduceat(values[:head], starts), values[head:]]
+
+    high_hist = np.fmax.reduceat(hist[:head], starts)
+    low_hist = np.fmin.reduceat(hist[:head], starts)
+    out = {
+        "x": x[np.r_[starts, tail]],
+        "open": df['Open'].to_numpy(dtype=float)[np.r_[starts, tail]],
+        "close": df['Close'].to_numpy(dtype=float)[np.r_[ends - 1, tail]],
+        "high": ohlc('High', np.fmax), "low": ohlc('Low', np.fmin),
+        "upper": ohlc('Upper', np.fmax), "lower": ohlc('Lower', np.fmin),
+        "hist": np.r_[np.where(np.abs(high_hist) >= np.abs(low_hist), high_hist, low_hist), hist[head:]],
+        "lines": {},
+    }
+
+    bucket_id = np.repeat(np.arange(len(starts)), ends - starts)
+    for col in line_cols:
+        values = df[col].to_numpy(dtype=float)
+        body = values[:head]
+        lows = np.repeat(np.fmin.reduceat(body, starts), ends - starts)
+        highs = np.repeat(np.fmax.reduceat(body, starts), ends - starts)
+        keep = np.union1d(_first_in_bucket(body == lows, bucket_id), _first_in_bucket(body == highs, bucket_id))
+        keep = np.r_[keep, tail]
+        out["lines"][col] = (x[keep], values[keep])
+    return out
+
+
+# ==========================================
+# 8. RAFRAÎCHISSEMENT EN ARRIÈRE-PLAN
+# ==========================================
+POLL_INTERVAL = 60  # secondes entre deux tours du poller
+POLL_DEFAULT_PERIOD = "2y"  # période suivie en permanence pour tout l'univers ACTIONS
+POLL_IDLE = 10 * 60  # une autre période n'est plus suivie si aucune session ne l'a lue depuis ce délai
+
+# Instantané immuable publié par le poller ; df est partagé entre sessions : lecture seule
+MarketSnapshot = namedtuple("MarketSnapshot", ["version", "ticker", "period", "df", "fonda", "news", "news_score",
+                                               "score", "reasons", "timeframe_scores", "mtf_score", "errors",
+                                               "computed_at"])
+
+
+class MarketPoller:
+    """ Un seul worker par processus : collecte, indicateurs et score de chaque (ticker, période) suivi.
+
+    Les sessions lisent le dernier instantané publié et ne relancent leur rendu que si sa version
+    change ; la charge amont ne dépend que du nombre de séries suivies, pas du nombre d'onglets.
+    Chaque tour force la synchronisation incrémentale des cours (refresh_history), sans attendre
+    l'expiration du cache.
+    """
+
+    def __init__(self, actions=None, period=POLL_DEFAULT_PERIOD, interval=POLL_INTERVAL, idle=POLL_IDLE):
+        self.actions = dict(actions or ACTIONS)
+        self.interval = interval
+        self.idle = idle
+        self._pinned = {(ticker, period) for ticker in self.actions.values()}
+        self._watched = {key: time.monotonic() for key in self._pinned}  # (ticker, période) -> dernière lecture
+        self._snapshots = {}  # (ticker, période) -> MarketSnapshot
+        self._version = 0
+        self._lock = threading.Lock()
+        self._refresh_locks = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self.published = 0
+        self.errors = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="market-poller", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def version(self, ticker, period):
+        """ Version du dernier instantané (0 si aucun) ; compte comme une lecture pour le suivi de la série """
+        with self._lock:
+            if (ticker, period) in self._watched:
+                self._watched[(ticker, period)] = time.monotonic()
+            snapshot = self._snapshots.get((ticker, period))
+        return snapshot.version if snapshot else 0
+
+    def get(self, ticker, period):
+        """ Dernier instantané de la série, calculé sur place (une seule fois) si elle n'est pas encore suivie """
+        key = (ticker, period)
+        with self._lock:
+            self._watched[key] = time.monotonic()
+        if self._thread is None:
+            self.start()
+        snapshot = self._snapshots.get(key)
+        return snapshot if snapshot is not None else self.refresh(ticker, period)
+
+    def refresh(self, ticker, period):
+        """ Recalcule la série et publie un nouvel instantané si quelque chose a changé """
+        with self._lock:
+            refresh_lock = self._refresh_locks.setdefault((ticker, period), threading.Lock())
+        with refresh_lock:
+            self.polls += 1
+            previous = self._snapshots.get((ticker, period))
+            name = next((n for n, t in self.actions.items() if t == ticker), ticker)
+            with timed("fetch", ticker=ticker, period=period):
+                df, fonda, news, news_score, errors = fetch_analysis_data(ticker, name, period)
+            if df.empty:
+                return previous  # on garde le dernier instantané valide
+            with timed("scoring"):
+                score, reasons = calculate_weighted_score(df, fonda, news_score)
+                timeframes = get_timeframe_indicators(ticker, period)
+                timeframe_scores, mtf_score = (calculate_multi_timeframe_score({"Jour": df, **timeframes})
+                                               if timeframes else ({}, None))
+
+            if previous is not None and self._unchanged(previous, df, fonda, news, score):
+                return previous
+            with self._lock:
+                self._version += 1
+                snapshot = MarketSnapshot(self._version, ticker, period, df, fonda, tuple(news), news_score, score,
+                                          tuple(reasons), timeframe_scores, mtf_score, tuple(errors),
+                                          datetime.now())
+                self._snapshots[(ticker, period)] = snapshot
+                self.published += 1
+            return snapshot
+
+    @staticmethod
+    def _unchanged(previous, df, fonda, news, score):
+        old = previous.df
+        return (len(old) == len(df) and old.index[-1] == df.index[-1]
+                and old['Close'].iloc[-1] == df['Close'].iloc[-1] and old['Volume'].iloc[-1] == df['Volume'].iloc[-1]
+                and previous.score == score and previous.fonda == fonda
+                and [n['link'] for n in previous.news] == [n['link'] for n in news])
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                for key, last_read in list(self._watched.items()):
+                    if key not in self._pinned and now - last_read > self.idle:
+                        del self._watched[key]
+                        self._snapshots.pop(key, None)
+                keys = list(self._watched)
+            synced = set()  # une synchronisation par série et par tour, quelle que soit la période affichée
+            for ticker, period in keys:
+                if self._stop.is_set():
+                    break
+                try:
+                    series = (ticker, base_period(period), get_interval(period))
+                    if series not in synced:
+                        synced.add(series)
+                        refresh_history(*series)
+                    self.refresh(ticker, period)
+                except Exception:
+                    self.errors += 1
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - now)))
+
+
+@functools.cache
+def get_market_poller():
+    return MarketPoller()
+
+
+# --- Mode live intraday ---
+LIVE_PERIOD, LIVE_INTERVAL = "1d", "2m"
+LIVE_REFRESH = 10  # secondes : fréquence des fragments live et âge maximum de la séance partagée
+
+
+@functools.cache
+def get_live_tails():
+    """ Séances intraday partagées : ticker -> {"checked", "df", "lock"}, et verrou du registre """
+    return {}, threading.Lock()
+
+
+def get_live_bars(ticker):
+    """ Séance du jour (2 min) avec indicateurs, partagée par toutes les sessions live du ticker.
+
+    Au plus une synchronisation incrémentale (bougies postérieures à la dernière stockée) par
+    ticker toutes les LIVE_REFRESH secondes ; les sessions concurrentes attendent ce résultat.
+    """
+    tails, registry_lock = get_live_tails()
+    with registry_lock:
+        tail = tails.setdefault(ticker, {"checked": 0.0, "df": None, "lock": threading.Lock()})
+    with tail["lock"]:
+        if tail["df"] is not None and time.monotonic() - tail["checked"] < LIVE_REFRESH:
+            return tail["df"]
+        import yfinance as yf
+        try:
+            with timed("live_sync", ticker=ticker):
+                df = sync_history(yf.Ticker(ticker), ticker, LIVE_PERIOD, LIVE_INTERVAL)
+        except Exception:
+            df = pd.DataFrame()
+        tail["checked"] = time.monotonic()
+        if not df.empty:
+            df = get_price_cache().put((ticker, LIVE_PERIOD, LIVE_INTERVAL), df)
+            with timed("indicators", ticker=ticker, bars=len(df)):
+                tail["df"] = calculate_indicators(df.copy(deep=False), key=(ticker, LIVE_PERIOD))
+        return tail["df"] if tail["df"] is not None else pd.DataFrame()
+
+
+# --- Bandeau de cotations ---
+# Libellé -> (symbole Yahoo, unité affichée) ; remplaçable par un fichier JSON (TAPE_WATCHLIST_PATH)
+TAPE_WATCHLIST = {
+    "BTC/USD": ("BTC-USD", "$"), "ETH/USD": ("ETH-USD", "$"), "TOTALENERGIES": ("TTE.PA", "€"),
+    "LVMH": ("MC.PA", "€"), "AIRBUS": ("AIR.PA", "€"), "HERMÈS": ("RMS.PA", "€"), "SANOFI": ("SAN.PA", "€"),
+    "CAC 40": ("^FCHI", ""), "S&P 500": ("^GSPC", ""), "NASDAQ": ("^IXIC", ""), "GOLD": ("GC=F", "$"),
+}
+TAPE_WATCHLIST_PATH = "watchlist.json"
+TAPE_REFRESH = 60  # secondes entre deux instantanés
+TAPE_IDLE = 10 * 60  # plus de rafraîchissement si personne n'a lu le bandeau depuis ce délai
+
+
+def load_watchlist(path=None):
+    """ Watchlist du bandeau : {"LIBELLÉ": ["SYMBOLE", "unité"]} en JSON, sinon TAPE_WATCHLIST """
+    try:
+        with open(path or TAPE_WATCHLIST_PATH, encoding="utf-8") as f:
+            return {label: tuple(spec) for label, spec in json.load(f).items()}
+    except (OSError, ValueError):
+        return dict(TAPE_WATCHLIST)
+
+
+def fetch_quotes(symbols):
+    """ Dernier cours et variation (%) vs la séance précédente, en une seule requête Yahoo multi-symboles """
+    import yfinance as yf
+    with timed("yahoo_quotes", symbols=len(symbols)):
+        raw = get_yahoo_gateway().call(("download", tuple(symbols), "5d", "1d"), yf.download, list(symbols),
+                                       period="5d", interval="1d", group_by='ticker', auto_adjust=True,
+                                       threads=True, progress=False)
+    quotes = {}
+    for symbol in symbols:
+        if isinstance(raw.columns, pd.MultiIndex):
+            if symbol not in raw.columns.get_level_values(0):
+                continue
+            close = raw[symbol]['Close'].dropna()
+        else:
+            close = raw['Close'].dropna()
+        if len(close) >= 2:
+            quotes[symbol] = (float(close.iloc[-1]), float(close.iloc[-1] / close.iloc[-2] - 1) * 100)
+        elif len(close) == 1:
+            quotes[symbol] = (float(close.iloc[-1]), 0.0)
+    return quotes
+
+
+class QuoteTape:
+    """ Instantané des cotations de la watchlist, partagé par toutes les sessions.
+
+    Un thread de fond le remplace en bloc toutes les `refresh` secondes : la lecture ne fait
+    jamais d'appel réseau et un échec conserve le dernier instantané valide.
+    """
+
+    def __init__(self, watchlist=None, refresh=TAPE_REFRESH, idle=TAPE_IDLE):
+        self.watchlist = watchlist or load_watchlist()
+        self.refresh_interval = refresh
+        self.idle = idle
+        self._snapshot = ({}, None)  # (symbole -> (cours, variation %), horodatage)
+        self._last_read = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.fetches = 0
+        self.errors = 0
+
+    def snapshot(self):
+        """ (cotations, horodatage) ; démarre le rafraîchissement s'il ne tourne pas encore.
+
+        Après une période sans lecteur, le rafraîchissement est relancé sans attendre le prochain
+        tour : l'instantané renvoyé peut dater, d'où son horodatage.
+        """
+        now = time.monotonic()
+        if now - self._last_read >= self.idle:
+            self._wake.set()
+        self._last_read = now
+        if self._thread is None:
+            self.start()
+        return self._snapshot
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quote-tape", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh(self):
+        symbols = [symbol for symbol, _ in self.watchlist.values()]
+        try:
+            quotes = fetch_quotes(symbols)
+        except Exception:
+            self.errors += 1
+            return False
+        self.fetches += 1
+        if quotes:
+            self._snapshot = ({**self._snapshot[0], **quotes}, datetime.now())
+        return bool(quotes)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if time.monotonic() - self._last_read < self.idle:
+                self.refresh()
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+
+@functools.cache
+def get_quote_tape():
+    return QuoteTape()
+
+
+# --- Alertes sur signaux ---
+ALERTS_PATH = "alerts.json"  # {"tickers": [...], "thresholds": {...}, "rules": [...]}, optionnel
+ALERT_PERIOD = "2y"  # amorçage de SMA 200 et MACD ; ensuite seules les nouvelles bougies comptent (extend)
+ALERT_RECENT_PERIOD = "5d"  # téléchargé à chaque passe pour les séries amorcées : nouvelles bougies et bougie révisée
+ALERT_INTERVAL = 60  # secondes entre deux passes
+ALERT_THRESHOLDS = {"rsi_low": 35, "rsi_high": 70}  # mêmes seuils que calculate_technical_score
+ALERT_QUEUE_SIZE = 1000  # dernières alertes gardées en mémoire pour l'interface
+ALERT_WEBHOOK_URL = os.environ.get("ESIGTRADE_ALERT_WEBHOOK")  # POST JSON des nouvelles alertes, si défini
+ALERT_WEBHOOK_TIMEOUT = 5
+ALERT_COLUMNS = ["Close"] + INDICATOR_COLUMNS
+
+ALERT_LABELS = {
+    "rsi_oversold": "RSI en survente",
+    "rsi_overbought": "RSI en surachat",
+    "bb_below": "Prix sous Bollinger basse",
+    "bb_above": "Prix sur Bollinger haute",
+    "golden_cross": "🌟 GOLDEN CROSS (SMA 50 croise SMA 200)",
+    "death_cross": "☠️ DEATH CROSS (SMA 50 passe sous SMA 200)",
+    "macd_bullish_cross": "MACD croise son signal à la hausse",
+    "macd_bearish_cross": "MACD croise son signal à la baisse",
+}
+RULE_OPERATORS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+alert_logger = logging.getLogger("esigtrade.alerts")
+
+
+def _signal_levels(state, th):
+    with np.errstate(invalid='ignore'):
+        return {
+            "rsi_oversold": state["RSI"] < th["rsi_low"],
+            "rsi_overbought": state["RSI"] > th["rsi_high"],
+            "bb_below": state["Close"] < state["Lower"],
+            "bb_above": state["Close"] > state["Upper"],
+            "golden_cross": state["SMA_50"] > state["SMA_200"],
+            "death_cross": state["SMA_50"] < state["SMA_200"],
+            "macd_bullish_cross": state["MACD"] > state["Signal_Line"],
+            "macd_bearish_cross": state["MACD"] < state["Signal_Line"],
+        }
+
+
+def alert_flags(prev, last, thresholds=None):
+    """ Signaux de tous les tickers à la fois ({colonne: tableau} de l'avant-dernière et de la dernière bougie).
+
+    Une règle ne vaut vrai que sur la bougie où sa condition devient vraie (entrée en survente,
+    franchissement d'une bande, croisement) : une condition qui dure ne se répète pas, même après
+    un redémarrage. Les comparaisons avec NaN (indicateur pas encore amorcé) valent faux.
+    """
+    th = {**ALERT_THRESHOLDS, **(thresholds or {})}
+    before, now = _signal_levels(prev, th), _signal_levels(last, th)
+    with np.errstate(invalid='ignore'):
+        # Croisement : la relation inverse (ou l'égalité) tenait sur la bougie précédente
+        before["golden_cross"] = ~(prev["SMA_50"] <= prev["SMA_200"])
+        before["death_cross"] = ~(prev["SMA_50"] >= prev["SMA_200"])
+        before["macd_bullish_cross"] = ~(prev["MACD"] <= prev["Signal_Line"])
+        before["macd_bearish_cross"] = ~(prev["MACD"] >= prev["Signal_Line"])
+    return {rule: now[rule] & ~before[rule] for rule in now}
+
+
+def user_rule_flags(prev, last, rules, tickers):
+    """ Seuils utilisateur {"name", "column", "op", "value"[, "tickers"]}, franchis sur la dernière bougie """
+    flags = {}
+    with np.errstate(invalid='ignore'):
+        for rule in rules:
+            op, value = RULE_OPERATORS[rule["op"]], float(rule["value"])
+            flag = op(last[rule["column"]], value) & ~op(prev[rule["column"]], value)
+            if rule.get("tickers"):
+                flag &= np.isin(tickers, rule["tickers"])
+            flags[f"user:{rule['name']}"] = flag
+    return flags
+
+
+def alert_rule_error(rule):
+    """ Motif de rejet d'une règle utilisateur, None si elle est valide """
+    if not isinstance(rule, dict):
+        return "objet JSON attendu"
+    if not rule.get("name"):
+        return "règle sans nom"
+    if rule.get("column") not in ALERT_COLUMNS:
+        return f"colonne inconnue {rule.get('column')!r} (attendu : {', '.join(ALERT_COLUMNS)})"
+    if rule.get("op") not in RULE_OPERATORS:
+        return f"opérateur inconnu {rule.get('op')!r} (attendu : {' '.join(RULE_OPERATORS)})"
+    try:
+        if not np.isfinite(float(rule.get("value"))):
+            return "seuil non fini"
+    except (TypeError, ValueError):
+        return f"seuil non numérique {rule.get('value')!r}"
+    if not isinstance(rule.get("tickers", []), list):
+        return "tickers doit être une liste"
+    return None
+
+
+def load_alert_config(path=None):
+    """ Watchlist, seuils et règles utilisateur des alertes (JSON), sinon univers ACTIONS et seuils par défaut.
+
+    Une règle invalide est écartée (avec un avertissement) sans bloquer les autres alertes.
+    """
+    try:
+        with open(path or ALERTS_PATH, encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    rules = []
+    for rule in config.get("rules", []):
+        error = alert_rule_error(rule)
+        if error:
+            alert_logger.warning("Règle d'alerte ignorée (%s) : %s", error, rule)
+        else:
+            rules.append(rule)
+    return {"tickers": config.get("tickers") or list(ACTIONS.values()),
+            "thresholds": {**ALERT_THRESHOLDS, **config.get("thresholds", {})},
+            "rules": rules}
+
+
+class AlertLog:
+    """ Journal des alertes (SQLite, même base que les cours) ; une alerte par (ticker, règle, bougie) """
+
+    def __init__(self, path=None):
+        self.path = path or OHLCV_DB_PATH
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS alerts (
+                ticker TEXT, rule TEXT, bar_ts INTEGER, fired_at INTEGER, label TEXT, close REAL,
+                PRIMARY KEY (ticker, rule, bar_ts)) WITHOUT ROWID""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record(self, alerts):
+        """ Enregistre les alertes et renvoie celles qui n'étaient pas déjà journalisées """
+        new = []
+        with self._lock, self._connect() as conn:
+            for alert in alerts:
+                cursor = conn.execute("INSERT OR IGNORE INTO alerts VALUES (?, ?, ?, ?, ?, ?)",
+                                      (alert["ticker"], alert["rule"], int(alert["bar"].timestamp()),
+                                       int(alert["fired_at"].timestamp()), alert["label"], alert["close"]))
+                if cursor.rowcount:
+                    new.append(alert)
+        return new
+
+
+@functools.cache
+def get_alert_log():
+    return AlertLog()
+
+
+def post_webhook(url, alerts, timeout=ALERT_WEBHOOK_TIMEOUT):
+    """ POST JSON {"alerts": [...]} ; point d'intégration (Slack, Teams, file de messages...) """
+    import urllib.request
+    body = json.dumps({"alerts": alerts}, ensure_ascii=False, default=str).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout):
+        pass
+
+
+class AlertEngine:
+    """ Évalue les règles d'alerte sur toute une watchlist, en tâche de fond.
+
+    Chaque ticker garde son moteur d'indicateurs incrémental : à chaque passe, les dernières séances
+    de la watchlist (une requête groupée) le prolongent en O(nouvelles bougies) via
+    IndicatorEngine.extend, nouvelle bougie ou bougie révisée comprise. Toutes les règles sont
+    ensuite évaluées en une fois sur l'état des deux dernières bougies de tous les tickers (alert_flags). Une alerte déjà émise pour la même bougie (bougie révisée entre deux
+    passes, redémarrage) est écartée par l'état de la passe précédente et par le journal SQLite.
+    """
+
+    def __init__(self, config=None, interval=ALERT_INTERVAL, webhook_url=ALERT_WEBHOOK_URL, log=None):
+        config = config or load_alert_config()
+        self.tickers = list(config["tickers"])
+        self.thresholds = config["thresholds"]
+        self.rules = config["rules"]
+        self.interval = interval
+        self.webhook_url = webhook_url
+        self.log = log
+        n = len(self.tickers)
+        self._engines = {}  # ticker -> IndicatorEngine, hors du LRU partagé (watchlists de milliers de tickers)
+        self._sources = [None] * n  # (buffer de Close, longueur) de la dernière série traitée
+        self._prev = {col: np.full(n, np.nan) for col in ALERT_COLUMNS}
+        self._last = {col: np.full(n, np.nan) for col in ALERT_COLUMNS}
+        self._bars = [None] * n
+        self._active = {}  # règle -> conditions vraies à la passe précédente
+        self._recent = deque(maxlen=ALERT_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.passes = 0
+        self.updated = 0
+        self.reseeded = 0
+        self.fired = 0
+        self.errors = 0
+        self.webhook_errors = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def recent(self, n=50):
+        """ Dernières alertes émises, la plus récente en premier """
+        with self._lock:
+            return list(self._recent)[:-n - 1:-1]
+
+    def evaluate(self, frames=None):
+        """ Une passe : mise à jour des séries modifiées, évaluation des règles ; renvoie les nouvelles alertes.
+
+        frames ({ticker: OHLCV}) remplace le téléchargement (fichiers locaux, tests).
+        """
+        if frames is None:
+            frames = self._fetch()
+        with timed("alerts_update", tickers=len(self.tickers)):
+            for i, ticker in enumerate(self.tickers):
+                df = frames.get(ticker)
+                if df is None or (ticker not in self._engines and len(df) < MIN_SCORING_BARS):
+                    continue
+                source = self._sources[i]
+                root = _buffer_root(df['Close'].to_numpy())
+                if source is not None and source[0] is root and source[1] == len(df):
+                    continue  # série inchangée depuis la passe précédente
+                indicator_engine = self._engines.get(ticker)
+                if indicator_engine is None:
+                    indicator_engine = self._engines[ticker] = IndicatorEngine()
+                if not indicator_engine.extend(df):
+                    self.reseeded += 1
+                latest = indicator_engine.latest(2)
+                for col in ALERT_COLUMNS:
+                    self._prev[col][i], self._last[col][i] = latest[col]
+                self._sources[i] = (root, len(df))
+                self._bars[i] = df.index[-1]
+                self.updated += 1
+
+        with timed("alerts_rules"):
+            flags = alert_flags(self._prev, self._last, self.thresholds)
+            flags.update(user_rule_flags(self._prev, self._last, self.rules, np.asarray(self.tickers)))
+            now = datetime.now()
+            alerts = []
+            for rule, flag in flags.items():
+                active = self._active.get(rule)
+                fired = flag & ~active if active is not None else flag
+                self._active[rule] = flag
+                for i in np.flatnonzero(fired):
+                    alerts.append({"fired_at": now, "ticker": self.tickers[i], "rule": rule,
+                                   "label": ALERT_LABELS.get(rule, rule.removeprefix("user:")),
+                                   "bar": self._bars[i], "close": float(self._last["Close"][i])})
+        self.passes += 1
+        return self._publish(alerts) if alerts else []
+
+    def _fetch(self):
+        """ Séries à jour de la watchlist, sans attendre l'expiration du cache des cours.
+
+        Les tickers déjà amorcés ne reçoivent que leurs dernières séances (une requête groupée
+        ALERT_RECENT_PERIOD par passe, hors cache) ; les autres, ou ceux dont la fenêtre récente
+        ne recouvre plus la dernière bougie traitée, leur historique ALERT_PERIOD (cache partagé).
+        """
+        seeded = [t for t in self.tickers if t in self._engines]
+        frames = {}
+        if seeded:
+            recent = download_batch(seeded, ALERT_RECENT_PERIOD, "1d")
+            frames = {t: df for t, df in recent.items() if df is not None and self._engines[t].overlaps(df)}
+        stale = [t for t in self.tickers if t not in frames]
+        if stale:
+            frames.update(get_history_batch(stale, ALERT_PERIOD, "1d"))
+        return frames
+
+    def _publish(self, alerts):
+        if self.log is not None:
+            alerts = self.log.record(alerts)
+        with self._lock:
+            self._recent.extend(alerts)
+            self.fired += len(alerts)
+        if alerts and self.webhook_url:
+            try:
+                post_webhook(self.webhook_url, alerts)
+            except Exception:
+                self.webhook_errors += 1
+        return alerts
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = time.monotonic()
+            try:
+                self.evaluate()
+            except Exception:
+                self.errors += 1
+                alert_logger.exception("Passe d'alertes en échec")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+
+@functools.cache
+def get_alert_engine():
+    return AlertEngine(log=get_alert_log())
+
+
+# ==========================================
+# 9. INSTRUMENTATION
+# ==========================================
+LATENCY_WINDOW = 1024  # dernières mesures conservées par étape pour les percentiles
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+METRICS_PATH = "metrics.prom"  # fichier texte au format Prometheus (collecteur textfile de node_exporter)
+METRICS_EXPORT_INTERVAL = 15  # secondes minimum entre deux écritures
+
+perf_logger = logging.getLogger("esigtrade.perf")
+_current_trace = contextvars.ContextVar("esigtrade_trace", default=None)
+
+
+class LatencyRecorder:
+    """ Histogrammes glissants par étape : fenêtre des LATENCY_WINDOW dernières durées + cumuls """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}  # étape -> deque de durées (secondes)
+        self._totals = {}  # étape -> [nombre, somme]
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+
+    def record(self, stage, seconds):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.window)
+                self._totals[stage] = [0, 0.0]
+            self._samples[stage].append(seconds)
+            totals = self._totals[stage]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def summary(self):
+        """ {étape: {"count", "sum", "p50", "p95", "p99"}} en secondes """
+        with self._lock:
+            snapshot = {stage: (np.fromiter(samples, float), *self._totals[stage])
+                        for stage, samples in self._samples.items()}
+        out = {}
+        for stage, (values, count, total) in snapshot.items():
+            quantiles = np.quantile(values, LATENCY_QUANTILES)
+            out[stage] = {"count": count, "sum": total,
+                          **{f"p{int(q * 100)}": v for q, v in zip(LATENCY_QUANTILES, quantiles)}}
+        return out
+
+    def to_prometheus(self):
+        lines = ["# HELP esigtrade_stage_latency_seconds Durée par étape (quantiles sur fenêtre glissante)",
+                 "# TYPE esigtrade_stage_latency_seconds summary"]
+        for stage, s in sorted(self.summary().items()):
+            for q in LATENCY_QUANTILES:
+                lines.append(f'esigtrade_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} '
+                             f'{s[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'esigtrade_stage_latency_seconds_sum{{stage="{stage}"}} {s["sum"]:.6f}')
+            lines.append(f'esigtrade_stage_latency_seconds_count{{stage="{stage}"}} {s["count"]}')
+        return lines
+
+
+@functools.cache
+def get_latency_recorder():
+    return LatencyRecorder()
+
+
+@contextlib.contextmanager
+def perf_trace():
+    """ Relevé des étapes exécutées dans le bloc (threads du pool de collecte compris) : {étape: secondes} """
+    trace = {}
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def timed(stage, **labels):
+    """ Mesure une étape : histogramme glissant, relevé du rerun en cours et événement de log structuré """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        get_latency_recorder().record(stage, elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace[stage] = trace.get(stage, 0.0) + elapsed
+        if perf_logger.isEnabledFor(logging.INFO):
+            event = {"event": "stage", "stage": stage, "ms": round(elapsed * 1e3, 3), **labels}
+            perf_logger.info(json.dumps(event, ensure_ascii=False, default=str), extra={"perf": event})
+
+
+def latency_table(trace=None):
+    """ Tableau du panneau de debug : durée du rerun en cours et percentiles glissants, en ms """
+    summary = get_latency_recorder().summary()
+    stages = list(trace) if trace else sorted(summary)
+    rows = []
+    for stage in stages:
+        s = summary.get(stage, {})
+        rows.append({"Étape": stage, "Rerun (ms)": trace[stage] * 1e3 if trace else None,
+                     **{f"p{int(q * 100)} (ms)": s.get(f"p{int(q * 100)}", np.nan) * 1e3 for q in LATENCY_QUANTILES},
+                     "N": s.get("count", 0)})
+    return pd.DataFrame(rows)
+
+
+def memory_report():
+    """ Mémoire par série : une ligne par entrée du cache des cours, moteur d'indicateurs,
+    série multi-horizons, instantané du poller et séance live.
+
+    "bytes" ne compte que les buffers propres à la ligne : les colonnes OHLC partagées avec le
+    cache (instantanés, tranches de période) ne sont comptées qu'une fois, sur la ligne "history".
+    """
+    seen, rows = set(), []
+    for key, _, df in get_price_cache().entries():
+        rows.append({"kind": "history", "series": key, "rows": len(df), "bytes": frame_nbytes(df, seen)})
+    engines, registry_lock = get_indicator_engines()
+    with registry_lock:
+        engine_items = list(engines.items())
+    for key, indicator_engine in engine_items:
+        rows.append({"kind": "indicators", "series": key, "rows": indicator_engine.n,
+                     "bytes": indicator_engine.nbytes})
+    entries, lock = get_timeframe_cache()
+    with lock:
+        timeframe_items = list(entries.items())
+    for key, (_, _, df) in timeframe_items:
+        rows.append({"kind": "timeframe", "series": key, "rows": len(df), "bytes": frame_nbytes(df, seen)})
+    if get_market_poller.cache_info().currsize:
+        for key, snapshot in list(get_market_poller()._snapshots.items()):
+            rows.append({"kind": "snapshot", "series": key, "rows": len(snapshot.df),
+                         "bytes": frame_nbytes(snapshot.df, seen)})
+    for ticker, tail in list(get_live_tails()[0].items()):
+        if tail["df"] is not None:
+            rows.append({"kind": "live", "series": (ticker, LIVE_PERIOD), "rows": len(tail["df"]),
+                         "bytes": frame_nbytes(tail["df"], seen)})
+    return pd.DataFrame(rows, columns=["kind", "series", "rows", "bytes"])
+
+
+def _cache_metrics():
+    """ Compteurs des caches partagés, au format Prometheus """
+    lines = []
+    price = get_price_cache().stats()
+    for name in ("hits", "misses", "evictions"):
+        lines += [f"# TYPE esigtrade_price_cache_{name}_total counter",
+                  f"esigtrade_price_cache_{name}_total {price[name]}"]
+    lines += ["# TYPE esigtrade_price_cache_bytes gauge", f"esigtrade_price_cache_bytes {price['bytes']}"]
+    lines.append("# TYPE esigtrade_memory_bytes gauge")
+    for kind, size in memory_report().groupby("kind")["bytes"].sum().items():
+        lines.append(f'esigtrade_memory_bytes{{kind="{kind}"}} {size}')
+    for name, value in get_yahoo_gateway().stats().items():
+        kind = "gauge" if name == "inflight" else "counter"
+        metric = f"esigtrade_yahoo_{name}" + ("" if kind == "gauge" else "_total")
+        lines += [f"# TYPE {metric} {kind}", f"{metric} {value}"]
+    feeds = get_feed_cache()
+    for name in ("hits", "not_modified", "downloads"):
+        lines += [f"# TYPE esigtrade_feed_cache_{name}_total counter",
+                  f"esigtrade_feed_cache_{name}_total {getattr(feeds, name)}"]
+    return lines
+
+
+def export_metrics(path=None, min_interval=0):
+    """ Écrit toutes les métriques au format texte Prometheus (remplacement atomique du fichier).
+
+    Avec min_interval, l'écriture est ignorée si la précédente date de moins de min_interval secondes.
+    """
+    recorder = get_latency_recorder()
+    now = time.monotonic()
+    with recorder._lock:
+        if min_interval and now - recorder._last_export < min_interval:
+            return False
+        recorder._last_export = now
+    path = path or METRICS_PATH
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(recorder.to_prometheus() + _cache_metrics()) + "\n")
+    os.replace(tmp, path)
+    return True
+
+
+# ==========================================
+# 10. CORRÉLATIONS & RISQUE DE PORTEFEUILLE
+# ==========================================
+TRADING_DAYS = 252  # annualisation des volatilités
+CORRELATION_WINDOW = 60  # séances de la corrélation glissante
+MIN_RETURN_OBS = 20  # observations communes minimum pour une corrélation ou une covariance
+
+EQUAL_WEIGHT, MIN_VARIANCE = "Équipondéré", "Variance min."
+
+# Résultat de portfolio_risk ; returns : rendements journaliers alignés (NaN si le titre ne cote pas)
+RiskReport = namedtuple("RiskReport", ["returns", "corr", "cov", "volatility", "weights", "portfolio_vol",
+                                       "avg_corr", "rolling_corr"])
+
+
+def returns_matrix(frames, period=None):
+    """ Rendements journaliers de tous les tickers sur un même calendrier (dates x tickers).
+
+    Chaque série est d'abord réduite à la période (comme slice_period), puis placée par sa date
+    locale dans une matrice commune (searchsorted) : des places de fuseaux différents tombent sur
+    la même ligne.
+    Un titre absent un jour donné vaut NaN ce jour-là et le suivant.
+    """
+    start = FULL_HISTORY if period is None else _period_start(period, pd.Timestamp.now(tz="UTC"))
+    start = None if start == FULL_HISTORY else pd.Timestamp(start, unit="s", tz="UTC")
+    days, closes = {}, {}
+    for ticker, df in frames.items():
+        if start is not None:
+            df = df.iloc[df.index.searchsorted(start if df.index.tz is not None else start.tz_localize(None)):]
+        if df.empty:
+            continue
+        index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+        days[ticker] = index.to_numpy().astype("datetime64[D]")
+        closes[ticker] = df['Close'].to_numpy(dtype=float)
+    if not days:
+        return pd.DataFrame()
+    calendar = np.unique(np.concatenate(list(days.values())))
+    prices = np.full((len(calendar), len(days)), np.nan)
+    for j, ticker in enumerate(days):
+        prices[np.searchsorted(calendar, days[ticker]), j] = closes[ticker]
+    return pd.DataFrame(prices[1:] / prices[:-1] - 1, index=pd.DatetimeIndex(calendar[1:]), columns=list(days))
+
+
+def pairwise_moments(returns):
+    """ Covariances, corrélations et observations communes par paire, NaN ignorés paire par paire.
+
+    Toutes les sommes sur les dates communes à (i, j) sont des produits matriciels des rendements
+    (NaN remplacés par 0) et du masque de présence : O(T x N²) en BLAS, sans boucle sur les paires.
+    """
+    present = ~np.isnan(returns)
+    if present.all():
+        # Aucun trou : un seul produit matriciel sur les rendements centrés
+        n = np.full((returns.shape[1],) * 2, float(len(returns)))
+        centered = returns - returns.mean(axis=0)
+        cov = centered.T @ centered / (len(returns) - 1)
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.outer(std, std)
+    else:
+        cov, corr, n = _pairwise_moments_masked(returns, present)
+    too_short = n < MIN_RETURN_OBS
+    cov[too_short] = np.nan
+    corr[too_short] = np.nan
+    return cov, np.clip(corr, -1.0, 1.0), n
+
+
+def _pairwise_moments_masked(returns, present):
+    mask = present.astype(float)
+    x = np.where(present, returns, 0.0)
+    n = mask.T @ mask
+    sx = x.T @ mask  # sx[i, j] : somme des rendements de i sur les dates où j cote aussi
+    sxx = (x * x).T @ mask
+    sxy = x.T @ x
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (sxy - sx * sx.T / n) / (n - 1)
+        var = (sxx - sx * sx / n) / (n - 1)  # variance de i sur les dates communes avec j
+        corr = cov / np.sqrt(var * var.T)
+    return cov, corr, n
+
+
+def rolling_correlation(returns, reference, window=CORRELATION_WINDOW):
+    """ Corrélation glissante de chaque colonne de returns (T x N) avec reference (T,).
+
+    Sommes glissantes par différences de sommes cumulées : O(T x N) quelle que soit la fenêtre.
+    Les window - 1 premières lignes, et les fenêtres à moins de moitié d'observations, valent NaN.
+    """
+    present = ~np.isnan(returns) & ~np.isnan(reference)[:, None]
+    # Centrage global : limite les pertes de précision des différences de sommes cumulées
+    x = np.where(present, returns - np.nanmean(returns, axis=0), 0.0)
+    y = np.where(present, (reference - np.nanmean(reference))[:, None], 0.0)
+
+    def window_sums(a):
+        cs = np.cumsum(a, axis=0)
+        out = np.full(a.shape, np.nan)
+        out[window - 1:] = cs[window - 1:] - np.vstack([np.zeros((1, a.shape[1])), cs[:-window]])
+        return out
+
+    n = window_sums(present.astype(float))
+    sx, sy = window_sums(x), window_sums(y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = window_sums(x * y) - sx * sy / n
+        vx = window_sums(x * x) - sx * sx / n
+        vy = window_sums(y * y) - sy * sy / n
+        corr = cov / np.sqrt(vx * vy)
+    corr[~(n >= window / 2)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _nearest_psd(cov):
+    """ Covariance symétrique définie positive (valeurs propres planchers) : les covariances paire
+    par paire, calculées sur des dates différentes, ne le sont pas toujours """
+    values, vectors = np.linalg.eigh((cov + cov.T) / 2)
+    floor = max(values.max(), 0.0) * 1e-10 or 1e-18
+    return (vectors * np.maximum(values, floor)) @ vectors.T
+
+
+def min_variance_weights(cov, long_only=True):
+    """ Poids (somme 1) du portefeuille de variance minimale : w = Σ⁻¹1 / 1ᵀΣ⁻¹1.
+
+    cov doit être définie positive (voir _nearest_psd). long_only : les poids négatifs sont mis
+    à zéro et le système est résolu à nouveau sur les titres restants, jusqu'à ce qu'il n'en
+    reste plus (quelques itérations).
+    """
+    active = np.ones(len(cov), dtype=bool)
+    while True:
+        sub = np.linalg.solve(cov[np.ix_(active, active)], np.ones(active.sum()))
+        sub /= sub.sum()
+        if not long_only or (sub >= 0).all():
+            break
+        active[np.flatnonzero(active)[sub < 0]] = False
+    weights = np.zeros(len(cov))
+    weights[active] = sub
+    return weights
+
+
+def portfolio_risk(actions, period="1y", window=CORRELATION_WINDOW, frames=None):
+    """ Corrélations, volatilités et allocations de tout l'univers ({nom: ticker}).
+
+    Historiques journaliers du cache partagé (série "max", la même que la page d'analyse) : un
+    seul téléchargement groupé pour les tickers absents. frames ({ticker: OHLCV}) l'évite.
+    La corrélation glissante est calculée contre le portefeuille équipondéré. None si moins de
+    deux titres exploitables.
+    """
+    if frames is None:
+        frames = get_history_batch(list(actions.values()), DAILY_BASE_PERIOD, "1d")
+    names = {ticker: name for name, ticker in actions.items()}
+    with timed("risk", tickers=len(frames), period=period):
+        returns = returns_matrix({t: frames[t] for t in actions.values() if t in frames}, period)
+        if returns.empty:
+            return None
+        counts = returns.notna().sum().to_numpy()
+        returns = returns.loc[:, counts >= MIN_RETURN_OBS]
+        if returns.shape[1] < 2:
+            return None
+        returns.columns = [names.get(t, t) for t in returns.columns]
+        values = returns.to_numpy()
+
+        cov, corr, _ = pairwise_moments(values)
+        cov = _nearest_psd(np.nan_to_num(cov))  # paires sans assez de dates communes : non corrélées
+        volatility = np.sqrt(np.diag(cov) * TRADING_DAYS)
+        equal = np.full(values.shape[1], 1 / values.shape[1])
+        weights = {EQUAL_WEIGHT: equal, MIN_VARIANCE: min_variance_weights(cov)}
+        portfolio_vol = {label: float(np.sqrt(max(w @ cov @ w, 0.0) * TRADING_DAYS))
+                         for label, w in weights.items()}
+        reference = np.nanmean(values, axis=1)  # rendement du portefeuille équipondéré
+        rolling = rolling_correlation(values, reference, window)
+
+    labels = returns.columns
+    return RiskReport(
+        returns=returns,
+        corr=pd.DataFrame(corr, index=labels, columns=labels),
+        cov=pd.DataFrame(cov * TRADING_DAYS, index=labels, columns=labels),
+        volatility=pd.Series(volatility, index=labels),
+        weights=pd.DataFrame(weights, index=labels),
+        portfolio_vol=portfolio_vol,
+        avg_corr=float(np.nanmean(corr[~np.eye(len(corr), dtype=bool)])),
+        rolling_corr=pd.DataFrame(rolling, index=returns.index, columns=labels),
+    )